@@ -0,0 +1,167 @@
+import random
+import sys
+import time
+
+from main import MCTSAgent
+from bitboard import BitboardCheckers
+from tablebase import Tablebase
+
+
+WIN = 100000
+MAN_VALUE = 100
+KING_VALUE = 300
+
+
+def material_evaluation(env):
+  # Static score from the point of view of the side to move.
+  counts = env.piece_counts()
+  score = (MAN_VALUE * (int(counts[1]) - int(counts[2])) +
+           KING_VALUE * (int(counts[3]) - int(counts[4])))
+  return score if env.player == 1 else -score
+
+
+class Timeout(Exception):
+  pass
+
+
+class AlphaBetaAgent:
+  # Negamax alpha-beta with iterative deepening. Captures are mandatory, so
+  # at the horizon the search keeps going while the side to move has to
+  # capture and only evaluates quiet positions. Continuation jumps of a
+  # multi-capture are searched without reducing depth. evaluate(env) must
+  # score the position for the side to move. With a tablebase (a Tablebase
+  # or its directory), positions it covers are scored exactly. Counters for
+  # the last move are kept in self.stats.
+  def __init__(self, time_limit=1.0, max_depth=None,
+               evaluate=material_evaluation, tablebase=None):
+    assert time_limit is not None or max_depth is not None
+    self.time_limit = time_limit
+    self.max_depth = max_depth
+    self.evaluate = evaluate
+    if isinstance(tablebase, str):
+      tablebase = Tablebase(tablebase)
+    self.tablebase = tablebase
+    self.stats = {}
+
+  def act(self, env):
+    start = time.perf_counter()
+    self.deadline = None if self.time_limit is None else start + self.time_limit
+    self.nodes = 0
+    self.killers = {}
+    self.history = {}
+    self.best_moves = {}
+    env = env.clone()
+
+    actions = env.legal_actions()
+    best_action, best_score, depth = actions[0], None, 0
+    while len(actions) > 1 and (self.max_depth is None or
+                                depth < self.max_depth):
+      try:
+        score = self.search(env, depth + 1, -WIN - 1, WIN + 1, 0)
+      except Timeout:
+        while env.history:
+          env.pop()
+        break
+      depth += 1
+      best_action, best_score = self.best_moves[env.hash], score
+      if abs(score) >= WIN - depth:
+        break
+
+    seconds = time.perf_counter() - start
+    self.stats = {
+      'depth': depth,
+      'score': best_score,
+      'nodes': self.nodes,
+      'seconds': seconds,
+      'nodes_per_sec': self.nodes / seconds if seconds > 0 else 0,
+    }
+    return best_action
+
+  def order(self, env, actions, ply):
+    best = self.best_moves.get(env.hash)
+    killers = self.killers.get(ply, ())
+
+    def key(action):
+      if action == best:
+        return 2, 0
+      if action in killers:
+        return 1, 0
+      return 0, self.history.get(action, 0)
+
+    return sorted(actions, key=key, reverse=True)
+
+  def search(self, env, depth, alpha, beta, ply):
+    self.nodes += 1
+    if (self.deadline is not None and self.nodes % 1024 == 0 and
+        time.perf_counter() >= self.deadline):
+      raise Timeout()
+
+    if self.tablebase is not None and ply > 0:
+      value = self.tablebase.probe(env)
+      if value is not None:
+        result, distance = value
+        if result > 0:
+          return WIN - ply - distance
+        if result < 0:
+          return -WIN + ply + distance
+        return 0
+
+    actions = env.legal_actions()
+    if not actions:
+      return -WIN + ply
+    is_capture = env.is_capture_move(actions[0])
+    if depth <= 0 and not is_capture:
+      return self.evaluate(env)
+
+    best_score, best_action = -WIN - 1, None
+    for action in self.order(env, actions, ply):
+      player = env.player
+      _, reward, done = env.push(action)
+      if done:
+        score = WIN - ply - 1
+      elif env.player == player:
+        score = self.search(env, depth, alpha, beta, ply + 1)
+      else:
+        score = -self.search(env, depth - 1, -beta, -alpha, ply + 1)
+      env.pop()
+
+      if score > best_score:
+        best_score, best_action = score, action
+      alpha = max(alpha, score)
+      if alpha >= beta:
+        if not is_capture:
+          killers = self.killers.setdefault(ply, [])
+          if action not in killers:
+            killers.insert(0, action)
+            del killers[2:]
+          self.history[action] = self.history.get(action, 0) + depth * depth
+        break
+
+    self.best_moves[env.hash] = best_action
+    return best_score
+
+
+def main():
+  # Throughput comparison with MCTS on positions from random games.
+  rng = random.Random(0)
+  seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+  alphabeta = AlphaBetaAgent(time_limit=seconds)
+  mcts = MCTSAgent(num_trials=None, time_limit=seconds, reuse_tree=False)
+  env = BitboardCheckers()
+  for plies in (0, 10, 20, 30):
+    env.reset()
+    for _ in range(plies):
+      _, _, done = env.step(rng.choice(env.legal_actions()))
+      if done:
+        break
+    alphabeta.act(env)
+    mcts.act(env)
+    print('ply %2d: alpha-beta depth %d, %.0f nodes/sec; '
+          'mcts %.0f playouts/sec, %.0f nodes/sec' % (
+            plies, alphabeta.stats['depth'], alphabeta.stats['nodes_per_sec'],
+            mcts.stats['playouts'] / mcts.stats['seconds'],
+            mcts.stats['nodes'] / mcts.stats['seconds']))
+
+
+if __name__ == '__main__':
+  main()
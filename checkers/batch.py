@@ -0,0 +1,278 @@
+import numpy as np
+import sys
+import time
+
+from main import BOARD_SIZE
+from bitboard import (BitboardCheckers, BETWEEN, BIT, FULL,
+                      INITIAL_OPP, INITIAL_OWN, NUM_SQUARES, RAYS, SQUARE_IJ,
+                      IJ_SQUARE, OPPOSITE, FORWARD, shift)
+
+
+# Actions are indexed as from_square * 32 + to_square.
+NUM_ACTIONS = NUM_SQUARES * NUM_SQUARES
+MAX_DISTANCE = BOARD_SIZE - 1
+SQUARES = np.arange(NUM_SQUARES, dtype=np.uint64)
+ROWS = np.array([i for i, j in SQUARE_IJ])
+COLS = np.array([j for i, j in SQUARE_IJ])
+BETWEEN_ARRAY = np.array(BETWEEN, dtype=np.uint64)
+PROMOTION = {1: sum(BIT[0:4]), 2: sum(BIT[28:32])}
+
+
+def _targets(d, p):
+  # Source squares with a square at distance p along direction d, and the
+  # action index of that move.
+  sources = [s for s in range(NUM_SQUARES) if len(RAYS[s][d]) >= p]
+  actions = [s * NUM_SQUARES + RAYS[s][d][p - 1] for s in sources]
+  return np.array(sources), np.array(actions)
+
+
+TARGETS = [[None] + [_targets(d, p) for p in range(1, MAX_DISTANCE + 1)]
+           for d in range(4)]
+
+
+def action_index(action):
+  i, j, ni, nj = action
+  return IJ_SQUARE[(i, j)] * NUM_SQUARES + IJ_SQUARE[(ni, nj)]
+
+
+def index_action(index):
+  return SQUARE_IJ[index // NUM_SQUARES] + SQUARE_IJ[index % NUM_SQUARES]
+
+
+def random_actions(legal, rng):
+  # Picks a uniformly random legal action per game.
+  counts = np.cumsum(legal, axis=1, dtype=np.int16)
+  choice = (rng.random(len(legal)) * counts[:, -1]).astype(np.int16)
+  return np.argmax(counts > choice[:, None], axis=1)
+
+
+class _Masks:
+  # Collects generated moves as (N, NUM_ACTIONS) boolean masks. Sources are
+  # merged per (direction, distance) first, since each of those maps to a
+  # distinct set of action columns.
+  def __init__(self, n):
+    self.n = n
+    self.pending_captures = {}
+    self.pending_simple = {}
+
+  def capture(self, sources, d, p):
+    self.pending_captures[d, p] = self.pending_captures.get((d, p), 0) | sources
+
+  def step(self, sources, d, p):
+    self.pending_simple[d, p] = self.pending_simple.get((d, p), 0) | sources
+
+  def mask(self, pending):
+    mask = np.zeros((self.n, NUM_ACTIONS), dtype=bool)
+    for (d, p), sources in pending.items():
+      squares, actions = TARGETS[d][p]
+      mask[:, actions] = (sources[:, None] >> SQUARES[squares]) & 1
+    return mask
+
+
+class _Movers:
+  # Only collects the squares that have a move, which is enough to tell
+  # whether a game has any capture or any move at all.
+  def __init__(self, n):
+    self.captures = np.zeros(n, dtype=np.uint64)
+    self.simple = np.zeros(n, dtype=np.uint64)
+
+  def capture(self, sources, d, p):
+    self.captures |= sources
+
+  def step(self, sources, d, p):
+    self.simple |= sources
+
+
+def _generate(out, own, opp, kings, sources, player):
+  # Follows the same rules as BitboardCheckers: men step forward and capture
+  # in all four directions, kings fly along empty diagonals.
+  empty = ~(own | opp) & FULL
+  men = sources & ~kings
+  king_sources = sources & kings
+  for d in range(4):
+    # empties[p] / opps[p]: squares whose neighbour at distance p along d is
+    # empty / an opponent piece.
+    empties, opps = [None], [None]
+    e, o = empty, opp
+    for p in range(MAX_DISTANCE):
+      e, o = shift(e, OPPOSITE[d]), shift(o, OPPOSITE[d])
+      empties.append(e)
+      opps.append(o)
+
+    forward = np.where(player == 1, d in FORWARD[1], d in FORWARD[2])
+    steps = np.where(forward, men, 0).astype(np.uint64) & empties[1]
+    if steps.any():
+      out.step(steps, d, 1)
+    jumps = men & opps[1] & empties[2]
+    if jumps.any():
+      out.capture(jumps, d, 2)
+
+    reach = king_sources
+    for q in range(1, MAX_DISTANCE + 1):
+      if not reach.any():
+        break
+      if (reach & empties[q]).any():
+        out.step(reach & empties[q], d, q)
+      landing = reach & opps[q]
+      for p in range(q + 1, MAX_DISTANCE + 1):
+        landing = landing & empties[p]
+        if not landing.any():
+          break
+        out.capture(landing, d, p)
+      reach = reach & empties[q]
+  return out
+
+
+def _legal(own, opp, kings, sources, player):
+  masks = _generate(_Masks(len(own)), own, opp, kings, sources, player)
+  captures = masks.mask(masks.pending_captures)
+  return np.where(captures.any(axis=1)[:, None], captures,
+                  masks.mask(masks.pending_simple))
+
+
+class BatchCheckers:
+  # N games of checkers in lockstep, stored as per-game bitboards relative to
+  # the side to move like BitboardCheckers. must holds the square a
+  # multi-jump has to continue from (FULL when unrestricted). A game is a
+  # draw after max_moves plies, as in RunGame (None for no limit). Finished
+  # games are reset automatically by step.
+  def __init__(self, num_games, max_moves=200):
+    self.num_games = num_games
+    self.max_moves = max_moves
+    self.own = np.zeros(num_games, dtype=np.uint64)
+    self.opp = np.zeros(num_games, dtype=np.uint64)
+    self.kings = np.zeros(num_games, dtype=np.uint64)
+    self.player = np.zeros(num_games, dtype=np.int8)
+    self.must = np.zeros(num_games, dtype=np.uint64)
+    self.moves = np.zeros(num_games, dtype=np.int64)
+    self.reset()
+
+  def reset(self, games=slice(None)):
+    self.own[games] = INITIAL_OWN
+    self.opp[games] = INITIAL_OPP
+    self.kings[games] = 0
+    self.player[games] = 1
+    self.must[games] = FULL
+    self.moves[games] = 0
+
+  def game(self, k):
+    env = BitboardCheckers()
+    env.own, env.opp, env.kings = (
+      int(self.own[k]), int(self.opp[k]), int(self.kings[k]))
+    env.player = int(self.player[k])
+    if self.must[k] != FULL:
+      env.must_i, env.must_j = SQUARE_IJ[int(self.must[k]).bit_length() - 1]
+    env.hash = env.compute_hash()
+    return env
+
+  def observation(self):
+    return self.player - 1, self.boards()
+
+  def boards(self):
+    bits = lambda bb: ((bb[:, None] >> SQUARES) & 1).astype(np.uint8)
+    own, opp, kings = bits(self.own), bits(self.opp), bits(self.kings)
+    player = self.player[:, None].astype(np.uint8)
+    values = own * player + opp * (3 - player) + 2 * kings
+    boards = np.zeros((self.num_games, BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+    boards[:, ROWS, COLS] = values
+    return boards
+
+  def legal_actions(self):
+    return _legal(self.own, self.opp, self.kings, self.own & self.must,
+                  self.player)
+
+  def step(self, actions):
+    actions = np.asarray(actions, dtype=np.int64)
+    src = actions // NUM_SQUARES
+    dst = actions % NUM_SQUARES
+    from_bit = np.left_shift(np.uint64(1), src.astype(np.uint64))
+    to_bit = np.left_shift(np.uint64(1), dst.astype(np.uint64))
+
+    promotion = np.where(self.player == 1, PROMOTION[1], PROMOTION[2])
+    promotion = promotion.astype(np.uint64)
+    is_king = (self.kings & from_bit) | (to_bit & promotion)
+    self.own ^= from_bit | to_bit
+    self.kings &= ~from_bit
+    self.kings |= np.where(is_king != 0, to_bit, 0).astype(np.uint64)
+
+    captured = BETWEEN_ARRAY[src, dst] & self.opp
+    self.opp &= ~captured
+    self.kings &= ~captured
+
+    opponent = 3 - self.player
+    movers = _generate(_Movers(self.num_games), self.opp, self.own,
+                       self.kings, self.opp, opponent)
+    dones = (movers.captures | movers.simple) == 0
+    rewards = np.where(dones, np.where(self.player == 1, 1, -1), 0)
+
+    movers = _generate(_Movers(self.num_games), self.own, self.opp,
+                       self.kings,
+                       np.where(captured != 0, to_bit, 0).astype(np.uint64),
+                       self.player)
+    again = movers.captures != 0
+    self.must = np.where(again, to_bit, FULL).astype(np.uint64)
+    switch = ~again
+    self.own[switch], self.opp[switch] = self.opp[switch], self.own[switch]
+    self.player[switch] = opponent[switch]
+
+    # Drawn games end with a reward of 0.
+    self.moves += 1
+    if self.max_moves is not None:
+      dones |= self.moves >= self.max_moves
+    self.reset(dones)
+    return self.player - 1, rewards, dones
+
+
+def differential_check(num_games, num_steps, seed=0, max_moves=200):
+  # Steps the batch with random legal actions next to one BitboardCheckers
+  # per game and compares legal moves and step results, drawing the games
+  # after max_moves plies.
+  rng = np.random.default_rng(seed)
+  batch = BatchCheckers(num_games, max_moves)
+  games = [BitboardCheckers() for _ in range(num_games)]
+  moves = [0] * num_games
+  for _ in range(num_steps):
+    legal = batch.legal_actions()
+    for k, env in enumerate(games):
+      expected = sorted(map(action_index, env.legal_actions()))
+      if list(np.flatnonzero(legal[k])) != expected:
+        raise AssertionError('legal_actions mismatch in game %d:\n%s' % (
+          k, env))
+    actions = random_actions(legal, rng)
+    players, rewards, dones = batch.step(actions)
+    for k, env in enumerate(games):
+      player, reward, done = env.step(index_action(actions[k]))
+      moves[k] += 1
+      done = done or moves[k] >= max_moves
+      if (reward, done) != (rewards[k], dones[k]):
+        raise AssertionError('step mismatch in game %d' % k)
+      if done:
+        env.reset()
+        moves[k] = 0
+      if env.position_key() != batch.game(k).position_key():
+        raise AssertionError('position mismatch in game %d' % k)
+
+
+def benchmark(num_games, num_steps, seed=0):
+  rng = np.random.default_rng(seed)
+  batch = BatchCheckers(num_games)
+  start = time.perf_counter()
+  finished = draws = 0
+  for _ in range(num_steps):
+    _, rewards, dones = batch.step(random_actions(batch.legal_actions(), rng))
+    finished += dones.sum()
+    draws += (dones & (rewards == 0)).sum()
+  seconds = time.perf_counter() - start
+  print('%d games x %d steps: %.0f steps/sec, %d games finished, %d drawn' % (
+    num_games, num_steps, num_games * num_steps / seconds, finished, draws))
+
+
+def main():
+  num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+  num_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+  differential_check(64, 300, max_moves=100)
+  benchmark(num_games, num_steps)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,369 @@
+import numpy as np
+import random
+import sys
+
+from main import Checkers, BOARD_SIZE, ZOBRIST, zobrist_state
+
+
+# Only the 32 dark squares are playable. Square s lives on row s // 4, the
+# squares are numbered row by row, so ascending square order is the same as
+# the row-major order Checkers.legal_actions walks the board in.
+NUM_SQUARES = 32
+FULL = (1 << NUM_SQUARES) - 1
+
+# Same direction order as the (di, dj) loops in Checkers.legal_actions.
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+OPPOSITE = [3, 2, 1, 0]
+FORWARD = {1: (0, 1), 2: (2, 3)}
+
+
+def square_to_ij(s):
+  i = s // 4
+  return i, 2 * (s % 4) + (1 - i % 2)
+
+
+def ij_to_square(i, j):
+  if not (0 <= i < BOARD_SIZE and 0 <= j < BOARD_SIZE) or (i + j) % 2 == 0:
+    return None
+  return 4 * i + j // 2
+
+
+SQUARE_IJ = [square_to_ij(s) for s in range(NUM_SQUARES)]
+IJ_SQUARE = {SQUARE_IJ[s]: s for s in range(NUM_SQUARES)}
+BIT = [1 << s for s in range(NUM_SQUARES)]
+SQUARE_ZOBRIST = [ZOBRIST[i][j] for i, j in SQUARE_IJ]
+MOVES = [[SQUARE_IJ[s] + SQUARE_IJ[t] for t in range(NUM_SQUARES)]
+         for s in range(NUM_SQUARES)]
+NEIGHBOR = [[ij_to_square(i + di, j + dj) for di, dj in DIRECTIONS]
+            for i, j in SQUARE_IJ]
+
+
+def _ray(s, d):
+  ray = []
+  t = NEIGHBOR[s][d]
+  while t is not None:
+    ray.append(t)
+    t = NEIGHBOR[t][d]
+  return ray
+
+
+# Squares along each diagonal ordered by distance from s.
+RAYS = [[_ray(s, d) for d in range(4)] for s in range(NUM_SQUARES)]
+
+BETWEEN = [[0] * NUM_SQUARES for _ in range(NUM_SQUARES)]
+for s in range(NUM_SQUARES):
+  for d in range(4):
+    mask = 0
+    for t in RAYS[s][d]:
+      BETWEEN[s][t] = mask
+      mask |= BIT[t]
+
+
+def _shift_table(d):
+  # Moving one step along a diagonal is a shift by 3/4 or 4/5 bits depending
+  # on row parity. Group source squares by shift amount and drop the ones
+  # that would leave the board.
+  groups = {}
+  for s in range(NUM_SQUARES):
+    t = NEIGHBOR[s][d]
+    if t is not None:
+      groups[abs(t - s)] = groups.get(abs(t - s), 0) | BIT[s]
+  (a, mask_a), (b, mask_b) = sorted(groups.items())
+  return mask_a, a, mask_b, b
+
+
+SHIFTS = [_shift_table(d) for d in range(4)]
+
+
+def shift(bb, d):
+  mask_a, a, mask_b, b = SHIFTS[d]
+  if d >= 2:
+    return ((bb & mask_a) << a) | ((bb & mask_b) << b)
+  return ((bb & mask_a) >> a) | ((bb & mask_b) >> b)
+
+
+def iter_bits(bb):
+  while bb:
+    low = bb & -bb
+    yield low.bit_length() - 1
+    bb ^= low
+
+
+INITIAL_OWN = sum(BIT[s] for s in range(20, 32))
+INITIAL_OPP = sum(BIT[s] for s in range(0, 12))
+
+
+class BitboardCheckers(Checkers):
+  # Position is kept as three 32-bit bitboards relative to the side to move:
+  # own pieces, opponent pieces and kings of either side.
+
+  def reset(self):
+    self.own = INITIAL_OWN
+    self.opp = INITIAL_OPP
+    self.kings = 0
+    self.player = 1
+    self.must_i = None
+    self.must_j = None
+    self.history = []
+    self.hash = self.compute_hash()
+
+  def clone(self):
+    other = self.__class__.__new__(self.__class__)
+    other.own, other.opp, other.kings = self.own, self.opp, self.kings
+    other.player = self.player
+    other.must_i = self.must_i
+    other.must_j = self.must_j
+    other.history = []
+    other.hash = self.hash
+    return other
+
+  def load(self, board, player=1, must_i=None, must_j=None):
+    self.own = self.opp = self.kings = 0
+    for s, (i, j) in enumerate(SQUARE_IJ):
+      v = board[i][j]
+      if v == 0:
+        continue
+      if v % 2 == player % 2:
+        self.own |= BIT[s]
+      else:
+        self.opp |= BIT[s]
+      if v > 2:
+        self.kings |= BIT[s]
+    self.player = player
+    self.must_i = must_i
+    self.must_j = must_j
+    self.history = []
+    self.hash = self.compute_hash()
+
+  def position_key(self):
+    return (self.player, self.must_i, self.must_j,
+            self.own, self.opp, self.kings)
+
+  @property
+  def board(self):
+    board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+    opponent = 1 + (self.player % 2)
+    for side, bb in ((self.player, self.own), (opponent, self.opp)):
+      for s in iter_bits(bb):
+        board[SQUARE_IJ[s]] = side + 2 if self.kings & BIT[s] else side
+    return board
+
+  def _bit(self, i, j):
+    s = ij_to_square(i, j)
+    return 0 if s is None else BIT[s]
+
+  def is_empty(self, i, j):
+    bit = self._bit(i, j)
+    return bool(bit) and not (self.own | self.opp) & bit
+
+  def is_self(self, i, j):
+    return bool(self.own & self._bit(i, j))
+
+  def is_opponent(self, i, j):
+    return bool(self.opp & self._bit(i, j))
+
+  def can_capture(self, i, j):
+    s = IJ_SQUARE[(i, j)]
+    return bool(self._captures(self.own, self.opp, self.kings, BIT[s]))
+
+  def is_capture_move(self, action):
+    i, j, ni, nj = action
+    return bool(BETWEEN[IJ_SQUARE[(i, j)]][IJ_SQUARE[(ni, nj)]] & self.opp)
+
+  def piece_counts(self):
+    counts = [0] * 5
+    opponent = 1 + (self.player % 2)
+    for side, bb in ((self.player, self.own), (opponent, self.opp)):
+      counts[side] = (bb & ~self.kings).bit_count()
+      counts[side + 2] = (bb & self.kings).bit_count()
+    return counts
+
+  def legal_actions(self):
+    if self.must_i is not None:
+      sources = BIT[IJ_SQUARE[(self.must_i, self.must_j)]] & self.own
+    else:
+      sources = self.own
+    return (self._captures(self.own, self.opp, self.kings, sources) or
+            self._simple_moves(self.own, self.opp, self.kings, sources,
+                               FORWARD[self.player]))
+
+  @staticmethod
+  def _captures(own, opp, kings, sources):
+    empty = ~(own | opp) & FULL
+    men = sources & ~kings
+    jumps = [men & shift(opp & shift(empty, OPPOSITE[d]), OPPOSITE[d])
+             for d in range(4)]
+    captures = []
+    for s in iter_bits(jumps[0] | jumps[1] | jumps[2] | jumps[3] |
+                       (sources & kings)):
+      if kings & BIT[s]:
+        for ray in RAYS[s]:
+          k, n = 0, len(ray)
+          while k < n and empty & BIT[ray[k]]:
+            k += 1
+          if k < n and opp & BIT[ray[k]]:
+            k += 1
+            while k < n and empty & BIT[ray[k]]:
+              captures.append(MOVES[s][ray[k]])
+              k += 1
+      else:
+        for d in range(4):
+          if jumps[d] & BIT[s]:
+            captures.append(MOVES[s][RAYS[s][d][1]])
+    return captures
+
+  @staticmethod
+  def _simple_moves(own, opp, kings, sources, forward):
+    empty = ~(own | opp) & FULL
+    men = sources & ~kings
+    steps = [0] * 4
+    for d in forward:
+      steps[d] = men & shift(empty, OPPOSITE[d])
+    moves = []
+    for s in iter_bits(steps[0] | steps[1] | steps[2] | steps[3] |
+                       (sources & kings)):
+      if kings & BIT[s]:
+        for ray in RAYS[s]:
+          for t in ray:
+            if not empty & BIT[t]:
+              break
+            moves.append(MOVES[s][t])
+      else:
+        for d in forward:
+          if steps[d] & BIT[s]:
+            moves.append(MOVES[s][RAYS[s][d][0]])
+    return moves
+
+  def step(self, action):
+    h = self.hash ^ zobrist_state(self.player, self.must_i, self.must_j)
+    self.must_i, self.must_j = None, None
+    i, j, ni, nj = action
+    s, t = IJ_SQUARE[(i, j)], IJ_SQUARE[(ni, nj)]
+
+    is_king = self.kings & BIT[s]
+    h ^= SQUARE_ZOBRIST[s][self.player + 2 if is_king else self.player]
+    self.own ^= BIT[s] | BIT[t]
+    self.kings &= ~BIT[s]
+    # make queen
+    if is_king or ni == (0 if self.player == 1 else BOARD_SIZE - 1):
+      self.kings |= BIT[t]
+      h ^= SQUARE_ZOBRIST[t][self.player + 2]
+    else:
+      h ^= SQUARE_ZOBRIST[t][self.player]
+
+    captured = BETWEEN[s][t] & self.opp
+    if captured:
+      piece = 1 + (self.player % 2) + (2 if self.kings & captured else 0)
+      h ^= SQUARE_ZOBRIST[captured.bit_length() - 1][piece]
+      self.opp &= ~captured
+      self.kings &= ~captured
+
+    reward = 0
+    done = self.is_finished()
+    if done:
+      reward = 1 if self.player == 1 else -1
+
+    if captured and self._captures(self.own, self.opp, self.kings, BIT[t]):
+      self.must_i, self.must_j = ni, nj
+    else:
+      self.own, self.opp = self.opp, self.own
+      self.player = 1 + (self.player % 2)
+    self.hash = h ^ zobrist_state(self.player, self.must_i, self.must_j)
+    return self.player - 1, reward, done
+
+  def push(self, action):
+    self.history.append((self.own, self.opp, self.kings, self.player,
+                         self.must_i, self.must_j, self.hash))
+    return self.step(action)
+
+  def pop(self):
+    (self.own, self.opp, self.kings, self.player,
+     self.must_i, self.must_j, self.hash) = self.history.pop()
+
+  def is_finished(self):
+    own, opp, kings = self.opp, self.own, self.kings
+    empty = ~(own | opp) & FULL
+    forward = FORWARD[1 + (self.player % 2)]
+    for d in range(4):
+      movers = own if d in forward else own & kings
+      if movers & shift(empty, OPPOSITE[d]):
+        return False
+    return not self._captures(own, opp, kings, own)
+
+  def __repr__(self):
+    return np.array_str(self.board)
+
+
+def random_position(rng):
+  board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+  for i, j in SQUARE_IJ:
+    r = rng.random()
+    if r < 0.55:
+      continue
+    v = rng.choice((1, 2, 1, 2, 3, 4))
+    # Men never stand on their own promotion row.
+    if (v == 1 and i == 0) or (v == 2 and i == BOARD_SIZE - 1):
+      v += 2
+    board[i][j] = v
+  return board
+
+
+def differential_check(num_positions, seed=0, max_plies=200):
+  # Plays random games from random (not necessarily reachable) positions on
+  # both engines side by side and compares move lists and step results, then
+  # unwinds both games with pop() back to the starting position.
+  rng = random.Random(seed)
+  reference = Checkers()
+  candidate = BitboardCheckers()
+  positions = 0
+  while positions < num_positions:
+    if rng.random() < 0.5:
+      reference.reset()
+    else:
+      reference.board = random_position(rng)
+      reference.player = rng.choice((1, 2))
+      reference.must_i, reference.must_j = None, None
+      reference.hash = reference.compute_hash()
+    start = reference.board.copy()
+    candidate.load(reference.board, reference.player)
+    for _ in range(max_plies):
+      positions += 1
+      legal = reference.legal_actions()
+      got = candidate.legal_actions()
+      if got != legal:
+        raise AssertionError('legal_actions mismatch:\n%s\nplayer %d must %s\n'
+                             'expected %s\ngot %s' % (
+                               reference, reference.player,
+                               (reference.must_i, reference.must_j), legal, got))
+      if not legal or positions >= num_positions:
+        break
+      action = rng.choice(legal)
+      expected = reference.push(action)
+      result = candidate.push(action)
+      if (result != expected or
+          candidate.player != reference.player or
+          (candidate.must_i, candidate.must_j) !=
+          (reference.must_i, reference.must_j) or
+          candidate.hash != reference.hash or
+          reference.hash != reference.compute_hash() or
+          not np.array_equal(candidate.board, reference.board)):
+        raise AssertionError('step %s mismatch: expected %s, got %s' % (
+          action, expected, result))
+      if expected[2]:
+        break
+    while reference.history:
+      reference.pop()
+      candidate.pop()
+    if (not np.array_equal(reference.board, start) or
+        not np.array_equal(candidate.board, start)):
+      raise AssertionError('pop did not restore the starting position')
+  return positions
+
+
+def main():
+  num_positions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  print('%d positions match.' % differential_check(num_positions))
+
+
+if __name__ == '__main__':
+  main()
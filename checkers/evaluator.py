@@ -0,0 +1,202 @@
+import random
+import sys
+import time
+
+import numpy as np
+
+from main import BOARD_SIZE, MCTSAgent
+from bitboard import BitboardCheckers
+
+
+# An evaluator maps a batch of positions to move priors and values in one
+# call: evaluate(envs) returns (priors, values) where priors[k] is aligned
+# with envs[k].legal_actions() and sums to 1, and values[k] in [-1, 1] is
+# from player 1's point of view like the rewards in main.py.
+
+
+class LinearEvaluator:
+  # Value: tanh of a linear function of material and advancement. Priors:
+  # softmax of a linear function of move features (promotion, king move,
+  # jump length, distance of the target to the centre column, leaving the
+  # back row). All positions of a batch go through the same array ops.
+  def __init__(self, value_weights=(0.3, 0.9, 0.02),
+               prior_weights=(2.0, 0.3, 0.2, -0.15, -0.5)):
+    self.value_weights = np.array(value_weights)
+    self.prior_weights = np.array(prior_weights)
+
+  def values(self, boards):
+    rows = np.arange(BOARD_SIZE)[None, :, None]
+    men1, men2 = boards == 1, boards == 2
+    features = np.stack([
+      men1.sum(axis=(1, 2)) - men2.sum(axis=(1, 2)),
+      (boards == 3).sum(axis=(1, 2)) - (boards == 4).sum(axis=(1, 2)),
+      (men1 * (BOARD_SIZE - 1 - rows)).sum(axis=(1, 2)) -
+      (men2 * rows).sum(axis=(1, 2)),
+    ], axis=1)
+    return np.tanh(features @ self.value_weights)
+
+  def priors(self, boards, actions):
+    counts = np.array([len(a) for a in actions])
+    segments = np.repeat(np.arange(len(actions)), counts)
+    moves = np.array([m for a in actions for m in a]).reshape(-1, 4)
+    i, j, ni, nj = moves.T
+    piece = boards[segments, i, j]
+    back_row = np.where(piece % 2 == 1, BOARD_SIZE - 1, 0)
+    features = np.stack([
+      ((piece == 1) & (ni == 0)) | ((piece == 2) & (ni == BOARD_SIZE - 1)),
+      piece >= 3,
+      np.abs(ni - i),
+      np.abs(nj - (BOARD_SIZE - 1) / 2),
+      (piece <= 2) & (i == back_row),
+    ], axis=1).astype(float)
+    logits = features @ self.prior_weights
+    top = np.full(len(actions), -np.inf)
+    np.maximum.at(top, segments, logits)
+    weights = np.exp(logits - top[segments])
+    totals = np.bincount(segments, weights, minlength=len(actions))
+    return np.split(weights / totals[segments], np.cumsum(counts)[:-1])
+
+  def evaluate(self, envs):
+    boards = np.stack([env.board for env in envs]).astype(np.int64)
+    actions = [env.legal_actions() for env in envs]
+    return self.priors(boards, actions), self.values(boards)
+
+
+class LeafQueue:
+  # Leaves of an engine's tree waiting for evaluation, each with its path
+  # from the root and a copy of its position. Queued paths carry a virtual
+  # loss so that the next selections spread out; flush evaluates them in one
+  # batch, expands the leaves with the priors and backs up the values.
+  def __init__(self, evaluator, engine):
+    self.evaluator = evaluator
+    self.engine = engine
+    self.paths = []
+    self.envs = []
+    self.pending = set()
+
+  def __len__(self):
+    return len(self.paths)
+
+  def __contains__(self, leaf):
+    return leaf in self.pending
+
+  def add(self, path, env):
+    self.engine.virtual_loss(path)
+    self.paths.append(path)
+    self.envs.append(env)
+    self.pending.add(path[-1])
+
+  def flush(self):
+    # Returns the number of nodes added to the tree.
+    if not self.paths:
+      return 0
+    priors, values = self.evaluator.evaluate(self.envs)
+    num_nodes = self.engine.num_nodes
+    for path, env, leaf_priors, value in zip(self.paths, self.envs, priors,
+                                             values):
+      self.engine.virtual_loss(path, -1)
+      self.engine.expand(path[-1], env, leaf_priors)
+      self.engine.backup(path, 1, float(value))
+    self.paths, self.envs = [], []
+    self.pending.clear()
+    return self.engine.num_nodes - num_nodes
+
+
+class EvaluatorAgent(MCTSAgent):
+  # PUCT search where leaves are valued by an evaluator instead of random
+  # rollouts. Up to batch_size leaves are selected under virtual loss and
+  # evaluated together; a batch ends early when a selection reaches a leaf
+  # that is already queued. Budgets and tree reuse are as in MCTSAgent,
+  # num_trials counts evaluated leaves.
+  def __init__(self, evaluator=None, batch_size=16, exploration=1.5,
+               **kwargs):
+    super().__init__(exploration=exploration, puct=True, **kwargs)
+    self.evaluator = LinearEvaluator() if evaluator is None else evaluator
+    self.batch_size = batch_size
+
+  def search(self, env):
+    start = time.perf_counter()
+    deadline = None if self.time_limit is None else start + self.time_limit
+    engine = self.engine
+    if not self.reused_root(env):
+      engine.clear(env)
+    queue = LeafQueue(self.evaluator, engine)
+    nodes = 0
+    if not engine.expanded(0):
+      queue.add([0], env.clone())
+      nodes += queue.flush()
+
+    playouts = 0
+    batches = 0
+    while not self.out_of_budget(playouts, nodes, deadline):
+      for _ in range(self.batch_size):
+        path, value = engine.select(env, expand=False)
+        leaf = path[-1]
+        collision = leaf in queue
+        if value is not None:
+          engine.backup(path, engine.movers[leaf], value)
+          playouts += 1
+        elif not collision:
+          queue.add(path, env.clone())
+        engine.unwind(env, path)
+        if collision or leaf == 0:
+          break
+      playouts += len(queue)
+      nodes += queue.flush()
+      batches += 1
+
+    seconds = time.perf_counter() - start
+    self.stats = {
+      'playouts': playouts,
+      'nodes': engine.num_nodes,
+      'batches': batches,
+      'seconds': seconds,
+      'playouts_per_sec': playouts / seconds if seconds > 0 else 0,
+    }
+
+
+def benchmark(batch_sizes=(1, 16, 64), num_positions=256, seed=0):
+  # Positions per second through the evaluator at different batch sizes.
+  rng = random.Random(seed)
+  envs = []
+  env = BitboardCheckers()
+  while len(envs) < num_positions:
+    _, _, done = env.step(rng.choice(env.legal_actions()))
+    if done:
+      env.reset()
+    else:
+      envs.append(env.clone())
+  evaluator = LinearEvaluator()
+  for batch_size in batch_sizes:
+    start = time.perf_counter()
+    for k in range(0, num_positions, batch_size):
+      evaluator.evaluate(envs[k:k + batch_size])
+    seconds = time.perf_counter() - start
+    print('batch %3d: %.0f positions/sec' % (batch_size,
+                                             num_positions / seconds))
+
+
+def main():
+  from tournament import play_game
+  num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+  benchmark()
+  for agent in (MCTSAgent(num_trials=300), EvaluatorAgent(num_trials=300)):
+    agent.act(BitboardCheckers())
+    print('%s: %d playouts, %d nodes, %.3f s' % (
+      type(agent).__name__, agent.stats['playouts'], agent.stats['nodes'],
+      agent.stats['seconds']))
+  specs = ('evaluator:num_trials=200', 'mcts:num_trials=200')
+  score = 0
+  for game_id in range(num_games):
+    players = specs if game_id % 2 == 0 else specs[::-1]
+    record = play_game(game_id, players, game_id, max_moves=150)
+    result = record['result'] if game_id % 2 == 0 else -record['result']
+    score += (result + 1) / 2
+    print('game %d: %s vs %s, result %d' % (game_id, players[0], players[1],
+                                            record['result']))
+  print('%s scored %.1f / %d against %s' % (specs[0], score, num_games,
+                                            specs[1]))
+
+
+if __name__ == '__main__':
+  main()
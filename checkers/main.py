@@ -1,92 +1,80 @@
 import numpy as np
+import os
 import random
-import copy  
 import itertools
+import sys
+import time
 import pygame
 
+sys.path.append(os.path.join(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mcts'))
 
+from engine import MCTS
 
-class RandomAgent:
-  def act(self, env):
-    return random.choice(env.legal_actions())
-
-
-class Node:
-  def __init__(self, env, action=None, reward=0, done=False, parent=None):
-    self.env = env
-    self.action = action
-    self.reward = reward
-    self.done = done
-    self.parent = parent
-    self.n = 0
-    self.total_reward = 0
-    self.children = []
-
-  def value(self):
-    assert self.n > 0
-    return self.total_reward / self.n
-
-  def select_leaf(self):
-    if not self.children:
-      return self
-    else:
-      return random.choice(self.children).select_leaf()
-
-  def expand(self):
-    for action in self.env.legal_actions():
-      next_env = copy.deepcopy(self.env)
-      next_observation, reward, done = next_env.step(action)
-      self.children.append(Node(next_env, action, reward, done, self))
-    return random.choice(self.children)
-
-  def rollout(self):
-    done = self.done
-    reward = self.reward
-    env = copy.deepcopy(self.env)
-    observation = env.observation()
-    while not done:
-      action = random.choice(env.legal_actions())
-      observation, reward, done = env.step(action) 
-    return reward
-
-  def backprop(self, reward):
-    self.total_reward += reward
-    self.n += 1
-    if self.parent:
-      self.parent.backprop(reward)
-  
 
 
-class MCTSAgent:
-  def __init__(self, num_trials=50):
-    self.num_trials = num_trials
+class RandomAgent:
+  def __init__(self, seed=None):
+    self.rng = random.Random(seed)
 
   def act(self, env):
-    player, board = env.observation()
-    is_max = (player == 0)
-    
-    root = Node(env)
-    root.expand()
+    return self.rng.choice(env.legal_actions())
 
-    best_reward = -float('inf') if is_max else float('inf')
-    best_action = None
 
-    for child in root.children:
-      for i in range(self.num_trials):
-        leaf = child.select_leaf()
-        if not leaf.done:
-          leaf = leaf.expand()
-        reward = leaf.rollout()
-        leaf.backprop(reward)
+class MCTSAgent:
+  # Checkers player on mcts.engine.MCTS. Search stops as soon as any of
+  # num_trials (playouts), time_limit (seconds) or max_nodes (nodes added to
+  # the tree) runs out; pass None to disable a budget. Counters for the last
+  # move are kept in self.stats. With reuse_tree the subtree of the position
+  # the opponent moved to is kept for the next search. table_size bounds the
+  # transposition table, None turns it off; max_memory bounds the tree's
+  # arrays. seed makes the search reproducible under a num_trials or
+  # max_nodes budget.
+  def __init__(self, num_trials=300, exploration=1.4, puct=False,
+               reuse_tree=True, time_limit=None, max_nodes=None,
+               table_size=1 << 16, seed=None, max_memory=None):
+    self.rng = random.Random(seed)
+    self.engine = MCTS(exploration, rng=self.rng, max_memory=max_memory,
+                       puct=puct, table_size=table_size)
+    self.num_trials = num_trials
+    self.time_limit = time_limit
+    self.max_nodes = max_nodes
+    self.reuse_tree = reuse_tree
+    self.root = None
+    self.root_env = None
+    self.stats = {}
+
+  def reused_root(self, env):
+    # Moves the engine's root to the position in env if the tree of the last
+    # move reaches it. Returns False when a new tree is needed.
+    if not self.reuse_tree or self.root_env is None:
+      return False
+    node = self.engine.find(self.root_env, env.hash, env.player, self.root)
+    if node is None:
+      return False
+    self.engine.reroot(node)
+    return True
 
-      candidate_reward = child.value()
+  def out_of_budget(self, playouts, nodes, deadline):
+    return ((self.num_trials is not None and playouts >= self.num_trials) or
+            (self.max_nodes is not None and nodes >= self.max_nodes) or
+            (deadline is not None and time.perf_counter() >= deadline))
 
-      if ((is_max and (candidate_reward > best_reward)) or
-          ((not is_max) and (candidate_reward < best_reward))):
-        best_reward = candidate_reward
-        best_action = child.action
+  def search(self, env):
+    # Searches from the position in env, which is restored on return.
+    self.engine.search(env, self.num_trials, self.time_limit, self.max_nodes,
+                       reuse=self.reused_root(env))
+    self.stats = self.engine.stats
 
-    return best_action 
+  def act(self, env):
+    env = env.clone()
+    self.search(env)
+    best = self.engine.best_child()
+    action = self.engine.move(best)
+    self.root = best
+    env.push(action)
+    self.root_env = env
+    return action
 
 
 def display(game, screen):
@@ -97,23 +85,30 @@ def display(game, screen):
     pygame.display.flip()
 
 
-def RunGame(game, agents, screen=None):
+def RunGame(game, agents, screen=None, max_moves=200):
+  # The game is a draw after max_moves plies (None for no limit), kings can
+  # otherwise shuffle back and forth forever.
   assert len(agents) == 2
   player = 0
 
   game.reset()
   display(game, screen)
-  while True:
+  moves = 0
+  reward = 0
+  while max_moves is None or moves < max_moves:
     print('Player %d move.' % (player + 1))
     action = agents[player].act(game)
     player, reward, done = game.step(action)
+    moves += 1
     display(game, screen)
     if done:
       break
   if reward == 1:
     print('Player 1 won!')
-  else:
+  elif reward == -1:
     print('Player 2 won!')
+  else:
+    print('Draw.')
 
 
 BOARD_SIZE = 8
@@ -124,6 +119,23 @@ FIGURE_COLORS = [(59, 25, 2), (212, 183, 163)]
 HIGHLIGHT_COLOR = (240, 237, 105)
 
 
+_zobrist_rng = random.Random(2024)
+# ZOBRIST[i][j][piece], with piece 0 (empty) hashing to 0.
+ZOBRIST = [[[0] + [_zobrist_rng.getrandbits(64) for piece in range(4)]
+            for j in range(BOARD_SIZE)] for i in range(BOARD_SIZE)]
+ZOBRIST_ARRAY = np.array(ZOBRIST, dtype=np.uint64)
+ZOBRIST_PLAYER = [0, 0, _zobrist_rng.getrandbits(64)]
+ZOBRIST_MUST = [[_zobrist_rng.getrandbits(64) for j in range(BOARD_SIZE)]
+                for i in range(BOARD_SIZE)]
+
+
+def zobrist_state(player, must_i, must_j):
+  key = ZOBRIST_PLAYER[player]
+  if must_i is not None:
+    key ^= ZOBRIST_MUST[must_i][must_j]
+  return key
+
+
 def sign(x):
   return 1 if x >= 0 else -1
 
@@ -145,6 +157,24 @@ class Checkers:
     self.player = 1
     self.must_i = None
     self.must_j = None
+    self.history = []
+    self.hash = self.compute_hash()
+
+  def clone(self):
+    other = self.__class__.__new__(self.__class__)
+    other.board = self.board.copy()
+    other.player = self.player
+    other.must_i = self.must_i
+    other.must_j = self.must_j
+    other.history = []
+    other.hash = self.hash
+    return other
+
+  def compute_hash(self):
+    # Full Zobrist hash of the position; step keeps self.hash up to date
+    # incrementally, call this after editing the board directly.
+    return (self.observation_hash((0, self.board)) ^
+            zobrist_state(self.player, self.must_i, self.must_j))
 
   def __str__(self):
     r = []
@@ -177,8 +207,13 @@ class Checkers:
 
   @staticmethod
   def observation_hash(observation):
-    _, board = observation
-    return hash(np.array_str(board))
+    player, board = observation
+    i, j = np.nonzero(board)
+    pieces = np.bitwise_xor.reduce(ZOBRIST_ARRAY[i, j, board[i, j]])
+    return int(pieces) ^ ZOBRIST_PLAYER[player + 1]
+
+  def position_key(self):
+    return self.player, self.must_i, self.must_j, self.board.tobytes()
 
   def is_valid(self, i, j):
     return (i >= 0 and i < BOARD_SIZE and j >= 0 and j < BOARD_SIZE)
@@ -271,29 +306,36 @@ class Checkers:
     # print(legal)
     return legal
 
+  def find_capture(self, i, j, ni, nj):
+    di = sign(ni - i)
+    dj = sign(nj - j)
+    ti, tj = i + di, j + dj
+    while ti != ni:
+      if self.board[ti][tj] != 0:
+        return ti, tj
+      ti += di
+      tj += dj
+    return None
+
   def step(self, action):
+    h = self.hash ^ zobrist_state(self.player, self.must_i, self.must_j)
     self.must_i, self.must_j = None, None
     i, j, ni, nj = action
+    captured = self.find_capture(i, j, ni, nj)
 
+    h ^= ZOBRIST[i][j][self.board[i][j]]
     self.board[ni][nj] = self.board[i][j] 
     self.board[i][j] = 0
 
     # make queen
     if (self.player % 2 == 1 and ni == 0) or (self.player % 2 == 0 and ni == 7):
       self.board[ni][nj] = self.player + 2
+    h ^= ZOBRIST[ni][nj][self.board[ni][nj]]
 
-    di = sign(ni - i)
-    dj = sign(nj - j)
-
-    has_capture = False
-    ti, tj = i + di, j + dj
-    while ti != ni:
-      if self.board[ti][tj] != 0:
-        has_capture = True
-        self.board[ti][tj] = 0
-        break
-      ti += di
-      tj += dj
+    has_capture = captured is not None
+    if has_capture:
+      h ^= ZOBRIST[captured[0]][captured[1]][self.board[captured]]
+      self.board[captured] = 0
 
     reward = 0
     done = self.is_finished()
@@ -304,14 +346,55 @@ class Checkers:
       self.must_i, self.must_j = ni, nj
     else:
       self.player = 1 + (self.player % 2)
+    self.hash = h ^ zobrist_state(self.player, self.must_i, self.must_j)
     return self.player - 1, reward, done 
 
+  def is_capture_move(self, action):
+    return self.find_capture(*action) is not None
+
+  def piece_counts(self):
+    # Number of pieces of each kind, indexed by board value.
+    return np.bincount(self.board.ravel(), minlength=5)
+
+  def push(self, action):
+    i, j, ni, nj = action
+    captured = self.find_capture(i, j, ni, nj)
+    if captured is not None:
+      captured += (self.board[captured],)
+    self.history.append((action, self.board[i][j], captured,
+                         self.must_i, self.must_j, self.player, self.hash))
+    return self.step(action)
+
+  def pop(self):
+    ((i, j, ni, nj), piece, captured,
+     self.must_i, self.must_j, self.player, self.hash) = self.history.pop()
+    self.board[ni][nj] = 0
+    self.board[i][j] = piece
+    if captured is not None:
+      ti, tj, captured_piece = captured
+      self.board[ti][tj] = captured_piece
+
   def is_finished(self):
     self.player = 1 + (self.player % 2)
     done = len(self.legal_actions()) == 0
     self.player = 1 + (self.player % 2)
     return done
 
+  def legal_moves(self):
+    # Cached for the current position: searches ask for the moves right
+    # after terminal_value has generated them.
+    if getattr(self, 'legal_cache', (None,))[0] != self.hash:
+      self.legal_cache = (self.hash, self.legal_actions())
+    return self.legal_cache[1]
+
+  def terminal_value(self):
+    # None while the game goes on, otherwise 1: the game only ends when the
+    # player who just moved leaves the opponent without moves, as in step.
+    # In the middle of a multi-jump the mover always has a capture left.
+    if self.must_i is not None:
+      return None
+    return None if self.legal_moves() else 1
+
   def __repr__(self):
     return np.array_str(self.board)
 
@@ -0,0 +1,152 @@
+import concurrent.futures
+import os
+import random
+import sys
+import time
+
+from main import MCTS, MCTSAgent
+from bitboard import BitboardCheckers
+
+
+def random_rollout(env, seed):
+  rng = random.Random(seed)
+  done = False
+  while not done:
+    _, reward, done = env.step(rng.choice(env.legal_actions()))
+  return reward
+
+
+def root_search(env, seed, agent_args):
+  agent = MCTSAgent(reuse_tree=False, seed=seed, **agent_args)
+  agent.search(env)
+  engine = agent.engine
+  return ([(engine.move(child), engine.visit_count(child))
+           for child in engine.children()], agent.stats['playouts'])
+
+
+class ParallelMCTSAgent:
+  # mode='root' runs num_workers independent searches from the same position
+  # and sums their root statistics. mode='leaf' keeps one tree and sends
+  # batches of rollouts to the pool, using virtual loss so that a batch does
+  # not pile onto the same leaf. num_trials is the total playout budget across
+  # all workers; time_limit is per move. Worker seeds are drawn from seed.
+  # The worker pool starts on the first move and is shut down by close(), or
+  # on leaving a with block.
+  def __init__(self, num_workers=None, mode='root', num_trials=1000,
+               time_limit=None, exploration=1.4, batch_size=None, seed=None):
+    assert mode in ('root', 'leaf')
+    self.num_workers = num_workers or os.cpu_count()
+    self.mode = mode
+    self.num_trials = num_trials
+    self.time_limit = time_limit
+    self.exploration = exploration
+    self.batch_size = batch_size or 4 * self.num_workers
+    self.rng = random.Random(seed)
+    self.executor = None
+    self.stats = {}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def pool(self):
+    if self.executor is None:
+      self.executor = concurrent.futures.ProcessPoolExecutor(self.num_workers)
+    return self.executor
+
+  def close(self):
+    if self.executor is not None:
+      self.executor.shutdown()
+      self.executor = None
+
+  def seeds(self, count):
+    return [self.rng.getrandbits(32) for _ in range(count)]
+
+  def act(self, env):
+    start = time.perf_counter()
+    if self.mode == 'root':
+      action, playouts = self.root_parallel(env)
+    else:
+      action, playouts = self.leaf_parallel(env, start)
+    self.stats = {
+      'playouts': playouts,
+      'seconds': time.perf_counter() - start,
+    }
+    return action
+
+  def root_parallel(self, env):
+    agent_args = {
+      'num_trials': (None if self.num_trials is None else
+                     max(1, self.num_trials // self.num_workers)),
+      'time_limit': self.time_limit,
+      'exploration': self.exploration,
+    }
+    futures = [self.pool().submit(root_search, env.clone(), seed, agent_args)
+               for seed in self.seeds(self.num_workers)]
+    visits = {}
+    playouts = 0
+    for future in futures:
+      children, worker_playouts = future.result()
+      playouts += worker_playouts
+      for action, n in children:
+        visits[action] = visits.get(action, 0) + n
+    return max(visits, key=visits.get), playouts
+
+  def leaf_parallel(self, env, start):
+    deadline = None if self.time_limit is None else start + self.time_limit
+    env = env.clone()
+    engine = MCTS(self.exploration, rng=self.rng)
+    engine.expand(0, env)
+    playouts = 0
+    while not ((self.num_trials is not None and playouts >= self.num_trials) or
+               (deadline is not None and time.perf_counter() >= deadline)):
+      paths = []
+      envs = []
+      for _ in range(self.batch_size):
+        path, value = engine.select(env)
+        if value is not None:
+          engine.backup(path, engine.movers[path[-1]], value)
+          playouts += 1
+        else:
+          engine.virtual_loss(path)
+          paths.append(path)
+          envs.append(env.clone())
+        engine.unwind(env, path)
+      rewards = self.pool().map(
+        random_rollout, envs, self.seeds(len(envs)),
+        chunksize=max(1, len(envs) // self.num_workers))
+      # Rewards are from player 1's point of view.
+      for path, reward in zip(paths, rewards):
+        engine.virtual_loss(path, -1)
+        engine.backup(path, 1, reward)
+        playouts += 1
+    return engine.best_move(), playouts
+
+
+def benchmark(max_workers, seconds):
+  env = BitboardCheckers()
+  counts = [1]
+  while 2 * counts[-1] < max_workers:
+    counts.append(2 * counts[-1])
+  if max_workers > 1:
+    counts.append(max_workers)
+  print('workers  mode  playouts/sec')
+  for num_workers in counts:
+    for mode in ('root', 'leaf'):
+      with ParallelMCTSAgent(num_workers, mode, num_trials=None,
+                             time_limit=seconds) as agent:
+        agent.act(env)  # warm up the pool
+        agent.act(env)
+      print('%7d  %4s  %12.0f' % (
+        num_workers, mode, agent.stats['playouts'] / agent.stats['seconds']))
+
+def main():
+  max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+  seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+  benchmark(max_workers, seconds)
+
+
+if __name__ == '__main__':
+  main()
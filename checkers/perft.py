@@ -0,0 +1,157 @@
+import sys
+import time
+
+import numpy as np
+
+from main import BOARD_SIZE, Checkers
+from bitboard import BitboardCheckers
+
+
+# Positions are written as eight rows from the top: '.' empty, 'w'/'b' men of
+# player 1/2 and 'W'/'B' their kings. must is the square of a piece in the
+# middle of a multi-jump. Every ply is one step, so each jump of a multi-jump
+# counts as a ply of its own, and a finished game has no children.
+PIECES = {'.': 0, 'w': 1, 'b': 2, 'W': 3, 'B': 4}
+
+
+def parse(rows, player=1, must=None):
+  board = np.array([[PIECES[c] for c in row] for row in rows.split()],
+                   dtype=np.uint8)
+  assert board.shape == (BOARD_SIZE, BOARD_SIZE)
+  # Pieces stand on the dark squares only.
+  assert not board[(np.indices(board.shape).sum(axis=0) % 2) == 0].any()
+  return board, player, must
+
+
+# name -> (position, reference leaf counts for depths 1, 2, ...).
+POSITIONS = {
+  'start': (parse('''
+    .b.b.b.b
+    b.b.b.b.
+    .b.b.b.b
+    ........
+    ........
+    w.w.w.w.
+    .w.w.w.w
+    w.w.w.w.'''), (7, 49, 302, 1469, 7350, 36644)),
+  # A double jump whose second jump has three choices, one of them backwards.
+  'multi-jump': (parse('''
+    ........
+    ..b.b...
+    ........
+    ..b.b...
+    .w......
+    ........
+    ...w....
+    ........'''), (1, 3, 11, 52, 173, 678, 2066, 8828)),
+  # The man promotes on the first jump and goes on capturing as a king.
+  'promotion': (parse('''
+    ........
+    ..b.....
+    .w......
+    ......b.
+    ........
+    ........
+    .......w
+    ....B...'''), (1, 1, 6, 36, 258, 1900, 13339)),
+  # A king capturing along the long diagonal, landing at any distance behind
+  # the man and jumping again from the far square.
+  'flying-king': (parse('''
+    ...B....
+    ........
+    .....b..
+    ........
+    .......w
+    ..b.....
+    .....w..
+    W.....B.'''), (2, 4, 20, 152, 1534, 11810)),
+  # The black man is in the middle of a multi-jump with two ways to go on.
+  'must-capture': (parse('''
+    .....b..
+    ........
+    ...b....
+    ..w.w...
+    ........
+    ..w...w.
+    .w......
+    ....W...''', player=2, must=(2, 3)),
+   (2, 2, 12, 31, 296, 811, 6181, 23339)),
+}
+
+
+def load(env, position):
+  board, player, must = position
+  must_i, must_j = must if must is not None else (None, None)
+  if isinstance(env, BitboardCheckers):
+    env.load(board, player, must_i, must_j)
+  else:
+    env.board = board.copy()
+    env.player = player
+    env.must_i, env.must_j = must_i, must_j
+    env.history = []
+    env.hash = env.compute_hash()
+  return env
+
+
+def perft(env, depth):
+  # Number of move sequences of exactly depth plies from the position in env,
+  # which is restored on return.
+  moves = env.legal_actions()
+  if depth == 1:
+    return len(moves)
+  nodes = 0
+  for move in moves:
+    done = env.push(move)[2]
+    if not done:
+      nodes += perft(env, depth - 1)
+    env.pop()
+  return nodes
+
+
+def divide(env, depth):
+  # Leaf counts below each move, to find where two engines disagree.
+  counts = {}
+  for move in env.legal_actions():
+    done = env.push(move)[2]
+    if depth == 1:
+      counts[move] = 1
+    else:
+      counts[move] = 0 if done else perft(env, depth - 1)
+    env.pop()
+  return counts
+
+
+def check(engines=(Checkers, BitboardCheckers), max_depth=None):
+  # Runs every position to each reference depth on each engine and raises
+  # AssertionError on the first wrong count. Returns the total nodes/sec of
+  # each engine.
+  rates = {}
+  for engine in engines:
+    total_nodes, total_seconds = 0, 0
+    for name, (position, reference) in POSITIONS.items():
+      env = load(engine(), position)
+      for depth, expected in enumerate(reference[:max_depth], 1):
+        start = time.perf_counter()
+        nodes = perft(env, depth)
+        seconds = time.perf_counter() - start
+        if nodes != expected:
+          raise AssertionError('%s %s depth %d: expected %d, got %d' % (
+            engine.__name__, name, depth, expected, nodes))
+        total_nodes += nodes
+        total_seconds += seconds
+      print('%-16s %-12s depth %d: %d nodes' % (
+        engine.__name__, name, len(reference[:max_depth]), nodes))
+    rates[engine.__name__] = total_nodes / total_seconds
+  return rates
+
+
+def main():
+  # python perft.py [max_depth]: checks the reference counts and reports
+  # nodes/sec of both engines.
+  max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else None
+  for name, rate in check(max_depth=max_depth).items():
+    print('%s: %.0f nodes/sec' % (name, rate))
+
+
+if __name__ == '__main__':
+  main()
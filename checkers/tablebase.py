@@ -0,0 +1,454 @@
+import itertools
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from main import Checkers, MCTSAgent
+from bitboard import (BitboardCheckers, BETWEEN, BIT, FORWARD, FULL,
+                      IJ_SQUARE, NUM_SQUARES, OPPOSITE, SQUARE_IJ,
+                      shift)
+
+
+# Positions are stored from the point of view of the side to move, oriented
+# as player 1 (moving towards row 0): player 2 positions are turned by 180
+# degrees, which maps square s to 31 - s. A material class (a, b, c, d) holds
+# a own men, b own kings, c opponent men and d opponent kings; its table has
+# one int16 per combination of squares for the four groups, indexed by their
+# combinatorial ranks. Stored values: 0 draw, k + 1 win in k plies, -(k + 1)
+# loss in k plies, INVALID for impossible placements. Every jump of a
+# multi-capture counts as a ply; positions in the middle of a multi-capture
+# are not stored but computed from the tables when probed.
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'tablebase')
+INVALID = -32768
+WIN, DRAW, LOSS = 1, 0, -1
+MAN_SQUARES = {
+  'own': FULL & ~sum(BIT[0:4]),
+  'opp': FULL & ~sum(BIT[28:32]),
+}
+COMB = [[math.comb(n, k) for k in range(NUM_SQUARES + 1)]
+        for n in range(NUM_SQUARES + 1)]
+_REVERSE8 = [int('{:08b}'.format(b)[::-1], 2) for b in range(256)]
+
+
+def rotate(bb):
+  return (_REVERSE8[bb & 255] << 24 | _REVERSE8[bb >> 8 & 255] << 16 |
+          _REVERSE8[bb >> 16 & 255] << 8 | _REVERSE8[bb >> 24])
+
+
+def rank(bb):
+  r = 0
+  k = 1
+  while bb:
+    low = bb & -bb
+    r += COMB[low.bit_length() - 1][k]
+    k += 1
+    bb ^= low
+  return r
+
+
+def material(own, opp, kings):
+  return ((own & ~kings).bit_count(), (own & kings).bit_count(),
+          (opp & ~kings).bit_count(), (opp & kings).bit_count())
+
+
+def table_size(cls):
+  size = 1
+  for count in cls:
+    size *= COMB[NUM_SQUARES][count]
+  return size
+
+
+def index(own, opp, kings):
+  r = 0
+  for group in (own & ~kings, own & kings, opp & ~kings, opp & kings):
+    r = r * COMB[NUM_SQUARES][group.bit_count()] + rank(group)
+  return r
+
+
+def encode(result, distance):
+  if result == WIN:
+    return distance + 1
+  if result == LOSS:
+    return -(distance + 1)
+  return 0
+
+
+def decode(value):
+  if value > 0:
+    return WIN, value - 1
+  if value < 0:
+    return LOSS, -value - 1
+  return DRAW, 0
+
+
+def better(a, b):
+  # Whether outcome a is better than b for the side choosing: faster wins,
+  # then draws, then slower losses.
+  key = lambda o: (o[0], -o[1] if o[0] == WIN else o[1])
+  return key(a) > key(b)
+
+
+def has_moves(own, opp, kings):
+  empty = ~(own | opp) & FULL
+  for d in range(4):
+    movers = own if d in FORWARD[1] else own & kings
+    if movers & shift(empty, OPPOSITE[d]):
+      return True
+  return bool(BitboardCheckers._captures(own, opp, kings, own))
+
+
+def legal_moves(own, opp, kings, sources):
+  # (from, to) squares in the canonical orientation.
+  moves = (BitboardCheckers._captures(own, opp, kings, sources) or
+           BitboardCheckers._simple_moves(own, opp, kings, sources,
+                                          FORWARD[1]))
+  return [(IJ_SQUARE[m[:2]], IJ_SQUARE[m[2:]]) for m in moves]
+
+
+def apply_move(own, opp, kings, s, t):
+  # Returns the position after the move, still from the mover's point of
+  # view, and whether it captured.
+  is_king = kings & BIT[s]
+  own ^= BIT[s] | BIT[t]
+  kings &= ~BIT[s]
+  if is_king or t < 4:
+    kings |= BIT[t]
+  captured = BETWEEN[s][t] & opp
+  return own, opp & ~captured, kings & ~captured, bool(captured)
+
+
+def successors(own, opp, kings, sources=None):
+  # For each legal move: ('end', None) when the opponent is left without
+  # moves, ('must', position, square) when the same piece has to keep
+  # jumping, otherwise ('next', position) with the opponent to move.
+  result = []
+  for s, t in legal_moves(own, opp, kings, own if sources is None else sources):
+    o, p, k, captured = apply_move(own, opp, kings, s, t)
+    swapped = (rotate(p), rotate(o), rotate(k))
+    move = SQUARE_IJ[s] + SQUARE_IJ[t]
+    if not has_moves(*swapped):
+      result.append((move, 'end', None))
+    elif captured and BitboardCheckers._captures(o, p, k, BIT[t]):
+      result.append((move, 'must', (o, p, k, t)))
+    else:
+      result.append((move, 'next', swapped))
+  return result
+
+
+def num_pieces(env):
+  if isinstance(env, BitboardCheckers):
+    return (env.own | env.opp).bit_count()
+  return int(np.count_nonzero(env.board))
+
+
+def canonical(env):
+  # (own, opp, kings, must square or None) of a Checkers or BitboardCheckers
+  # position, oriented as player 1.
+  if not isinstance(env, BitboardCheckers):
+    board = BitboardCheckers()
+    board.load(env.board, env.player, env.must_i, env.must_j)
+    env = board
+  own, opp, kings = env.own, env.opp, env.kings
+  must = (None if env.must_i is None else
+          IJ_SQUARE[(env.must_i, env.must_j)])
+  if env.player == 2:
+    own, opp, kings = rotate(own), rotate(opp), rotate(kings)
+    must = None if must is None else NUM_SQUARES - 1 - must
+  return own, opp, kings, must
+
+
+class Tablebase:
+  # Probing API over the class tables in directory, memory-mapped on first
+  # use. probe(env) returns (result, distance) for the side to move: result
+  # is WIN, DRAW or LOSS and distance the number of plies to the end with
+  # best play, or None when the position has more than max_pieces pieces.
+  def __init__(self, directory=DEFAULT_DIRECTORY, max_pieces=None):
+    self.directory = directory
+    if max_pieces is None:
+      names = os.listdir(directory) if os.path.isdir(directory) else []
+      max_pieces = max([sum(map(int, name[:4])) for name in names
+                        if name.endswith('.bin')] or [0])
+    self.max_pieces = max_pieces
+    self.tables = {}
+    self.probes = 0
+
+  def path(self, cls):
+    return os.path.join(self.directory, '%d%d%d%d.bin' % cls)
+
+  def table(self, cls):
+    table = self.tables.get(cls)
+    if table is None:
+      table = self.tables[cls] = np.memmap(self.path(cls), dtype=np.int16,
+                                           mode='r')
+    return table
+
+  def lookup(self, own, opp, kings):
+    cls = material(own, opp, kings)
+    if not own:
+      return LOSS, 0
+    if sum(cls) > self.max_pieces:
+      return None
+    self.probes += 1
+    return decode(int(self.table(cls)[index(own, opp, kings)]))
+
+  def must_value(self, own, opp, kings, square):
+    # A position in the middle of a multi-capture: the best continuation.
+    best = None
+    for _, kind, position in successors(own, opp, kings, BIT[square]):
+      outcome = self.outcome(kind, position)
+      if outcome is None:
+        return None
+      if best is None or better(outcome, best):
+        best = outcome
+    return best
+
+  def outcome(self, kind, position):
+    # Outcome of a move for the player making it.
+    if kind == 'end':
+      return WIN, 1
+    if kind == 'must':
+      value = self.must_value(*position)
+      return None if value is None else (value[0], value[1] + 1)
+    value = self.lookup(*position)
+    return None if value is None else (-value[0], value[1] + 1)
+
+  def probe(self, env):
+    if num_pieces(env) > self.max_pieces:
+      return None
+    own, opp, kings, must = canonical(env)
+    if must is not None:
+      return self.must_value(own, opp, kings, must)
+    return self.lookup(own, opp, kings)
+
+  def best_action(self, env):
+    # Action with the best outcome for the side to move, or None.
+    if num_pieces(env) > self.max_pieces:
+      return None
+    own, opp, kings, must = canonical(env)
+    sources = None if must is None else BIT[must]
+    best, best_outcome = None, None
+    for move, kind, position in successors(own, opp, kings, sources):
+      outcome = self.outcome(kind, position)
+      if outcome is None:
+        return None
+      if best is None or better(outcome, best_outcome):
+        best, best_outcome = move, outcome
+    if best is not None and env.player == 2:
+      best = tuple(7 - x for x in best)
+    return best
+
+
+def material_classes(max_pieces):
+  # Classes in the order they can be solved: a move leads to fewer pieces
+  # (capture), fewer men (promotion) or the same class with sides swapped.
+  classes = [cls for cls in itertools.product(range(max_pieces + 1), repeat=4)
+             if cls[0] + cls[1] and cls[2] + cls[3] and sum(cls) <= max_pieces]
+  return sorted(classes, key=lambda cls: (sum(cls), cls[0] + cls[2], cls))
+
+
+def positions(cls):
+  a, b, c, d = cls
+  squares = range(NUM_SQUARES)
+  bits = lambda combo: sum(BIT[s] for s in combo)
+  for own_men in itertools.combinations(squares, a):
+    own_men = bits(own_men)
+    if own_men & ~MAN_SQUARES['own']:
+      continue
+    for own_kings in itertools.combinations(squares, b):
+      own_kings = bits(own_kings)
+      if own_kings & own_men:
+        continue
+      for opp_men in itertools.combinations(squares, c):
+        opp_men = bits(opp_men)
+        if opp_men & (own_men | own_kings | ~MAN_SQUARES['opp']):
+          continue
+        for opp_kings in itertools.combinations(squares, d):
+          opp_kings = bits(opp_kings)
+          if opp_kings & (own_men | own_kings | opp_men):
+            continue
+          yield (own_men | own_kings, opp_men | opp_kings,
+                 own_kings | opp_kings)
+
+
+class _Builder(Tablebase):
+  # Tables are kept in memory while building and written out per class.
+  def table(self, cls):
+    return self.tables[cls]
+
+  def solve(self, component):
+    # Retrograde analysis over the classes of one component (a class and its
+    # side-swapped twin). Outcomes known from smaller classes seed a queue of
+    # events per ply: a 'win' event resolves a position as won, a 'bad'
+    # event records one more move leading to a won position for the
+    # opponent; a position all of whose moves are bad is lost. Processing
+    # plies in order gives the fastest wins and the slowest losses.
+    ids = {}
+    for cls in component:
+      for position in positions(cls):
+        ids[position] = len(ids)
+    keys = list(ids)
+    remaining = [0] * len(keys)
+    predecessors = [[] for _ in keys]
+    events = {}
+    push = lambda ply, kind, p: events.setdefault(ply, []).append((kind, p))
+    for p, (own, opp, kings) in enumerate(keys):
+      moves = successors(own, opp, kings)
+      remaining[p] = len(moves)
+      if not moves:
+        push(0, 'lost', p)
+      for _, kind, position in moves:
+        if kind == 'next' and position in ids:
+          predecessors[ids[position]].append(p)
+          continue
+        result, distance = self.outcome(kind, position)
+        if result == WIN:
+          push(distance, 'win', p)
+        elif result == LOSS:
+          push(distance, 'bad', p)
+
+    values = [None] * len(keys)
+    ply = 0
+    while events:
+      for kind, p in events.pop(ply, []):
+        if values[p] is not None:
+          continue
+        if kind == 'bad':
+          remaining[p] -= 1
+          if remaining[p]:
+            continue
+          kind = 'lost'
+        if kind == 'win':
+          values[p] = (WIN, ply)
+          for q in predecessors[p]:
+            push(ply + 1, 'bad', q)
+        else:
+          values[p] = (LOSS, ply)
+          for q in predecessors[p]:
+            push(ply + 1, 'win', q)
+      ply += 1
+
+    for cls in component:
+      self.tables[cls] = np.full(table_size(cls), INVALID, dtype=np.int16)
+    for p, position in enumerate(keys):
+      self.tables[material(*position)][index(*position)] = encode(
+        *(values[p] or (DRAW, 0)))
+
+
+def build(directory=DEFAULT_DIRECTORY, max_pieces=3):
+  os.makedirs(directory, exist_ok=True)
+  builder = _Builder(directory, max_pieces)
+  done = set()
+  for cls in material_classes(max_pieces):
+    if cls in done:
+      continue
+    component = sorted({cls, cls[2:] + cls[:2]})
+    start = time.perf_counter()
+    builder.solve(component)
+    for c in component:
+      builder.tables[c].tofile(builder.path(c))
+      done.add(c)
+      table = builder.tables[c]
+      valid = table[table != INVALID]
+      print('%d%d%d%d: %7d positions, %6d won, %6d lost, %6d drawn, '
+            'longest %3d plies, %.1f s' % (
+              c + (len(valid), (valid > 0).sum(), (valid < 0).sum(),
+                   (valid == 0).sum(), np.abs(valid).max() - 1,
+                   time.perf_counter() - start)))
+
+
+class TablebaseAgent:
+  # Plays from the tablebase when the position is covered, otherwise asks
+  # the fallback agent.
+  def __init__(self, fallback=None, directory=DEFAULT_DIRECTORY):
+    self.tablebase = Tablebase(directory)
+    self.fallback = MCTSAgent() if fallback is None else fallback
+
+  def act(self, env):
+    action = self.tablebase.best_action(env)
+    return self.fallback.act(env) if action is None else action
+
+
+def backup(tablebase, env):
+  # Outcome for the side to move from its moves, played through the
+  # reference Checkers rules and probing the resulting positions.
+  best = None
+  player = env.player
+  for action in env.legal_actions():
+    _, _, done = env.push(action)
+    if done:
+      outcome = (WIN, 1)
+    else:
+      result, distance = tablebase.probe(env)
+      if env.player != player:
+        result = -result
+      outcome = (result, 0 if result == DRAW else distance + 1)
+    env.pop()
+    if best is None or better(outcome, best):
+      best = outcome
+  return (LOSS, 0) if best is None else best
+
+
+def verify(tablebase, num_positions=500, seed=0):
+  # For random positions of either colour: the stored outcome must match a
+  # one-ply backup through Checkers, and won positions must play out in the
+  # stored number of plies with the tablebase's moves on both sides.
+  rng = random.Random(seed)
+  classes = {cls: list(positions(cls))
+             for cls in material_classes(tablebase.max_pieces)}
+  won = 0
+  for _ in range(num_positions):
+    cls = rng.choice(list(classes))
+    own, opp, kings = rng.choice(classes[cls])
+    env = BitboardCheckers()
+    env.player = rng.choice((1, 2))
+    if env.player == 2:
+      own, opp, kings = rotate(own), rotate(opp), rotate(kings)
+    env.own, env.opp, env.kings = own, opp, kings
+    env.must_i, env.must_j = None, None
+    env.hash = env.compute_hash()
+    reference = Checkers()
+    reference.board = env.board
+    reference.player = env.player
+    reference.hash = reference.compute_hash()
+
+    stored = tablebase.probe(reference)
+    if backup(tablebase, reference) != stored:
+      raise AssertionError('%s: stored %s, backup %s\n%s' % (
+        cls, stored, backup(tablebase, reference), reference))
+    if stored[0] != WIN:
+      continue
+    plies, done = 0, False
+    while not done:
+      _, _, done = env.step(tablebase.best_action(env))
+      plies += 1
+    if plies != stored[1]:
+      raise AssertionError('%s: won in %d plies, stored %d\n%s' % (
+        cls, plies, stored[1], env))
+    won += 1
+  print('%d positions match a backup through Checkers, %d won ones play out '
+        'in their stored distance' % (num_positions, won))
+
+
+def main():
+  max_pieces = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+  directory = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DIRECTORY
+  build(directory, max_pieces)
+  tablebase = Tablebase(directory)
+  verify(tablebase)
+  start = time.perf_counter()
+  count = 0
+  for cls in material_classes(max_pieces)[:20]:
+    for own, opp, kings in itertools.islice(positions(cls), 500):
+      tablebase.lookup(own, opp, kings)
+      count += 1
+  seconds = time.perf_counter() - start
+  print('%.0f probes/sec' % (count / seconds))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,236 @@
+import argparse
+import ast
+import concurrent.futures
+import contextlib
+import json
+import math
+import random
+import time
+
+from main import Checkers, RandomAgent, MCTSAgent
+from alphabeta import AlphaBetaAgent
+from evaluator import EvaluatorAgent
+from parallel import ParallelMCTSAgent
+from bitboard import BitboardCheckers
+from batch import action_index, index_action
+
+
+AGENTS = {
+  'random': RandomAgent,
+  'mcts': MCTSAgent,
+  'alphabeta': AlphaBetaAgent,
+  'evaluator': EvaluatorAgent,
+  'parallel': ParallelMCTSAgent,
+}
+# Agents that draw random numbers and take a seed.
+SEEDED = {'random', 'mcts', 'evaluator', 'parallel'}
+
+
+def make_agent(spec, seed=None):
+  # 'name' or 'name:key=value,key=value', e.g. 'mcts:num_trials=100'. A seed
+  # in the spec wins over the seed argument.
+  name, _, args = spec.partition(':')
+  kwargs = {}
+  for arg in filter(None, args.split(',')):
+    key, value = arg.split('=')
+    kwargs[key] = ast.literal_eval(value)
+  if name in SEEDED:
+    kwargs.setdefault('seed', seed)
+  return AGENTS[name](**kwargs)
+
+
+# A game record, one JSON line in the tournament output, is also its replay
+# log: game, seed, players, max_moves, result and moves, with moves stored as
+# from_square * 32 + to_square. replay() plays the moves back on any engine;
+# play_game() with the same seed, players and max_moves plays the same moves
+# again as long as the agents run on num_trials or max_nodes budgets rather
+# than time limits.
+def play_game(game_id, specs, seed, max_moves):
+  # Plays one game between specs[0] (player 1) and specs[1] (player 2) and
+  # returns its record. result is 1 / -1 when player 1 / 2 wins, 0 for a
+  # draw at the move limit. Each agent gets its own seed drawn from seed.
+  # Agents with a close() method, which hold worker processes, are closed
+  # when the game ends.
+  rng = random.Random(seed)
+  env = BitboardCheckers()
+  moves = []
+  result = 0
+  with contextlib.ExitStack() as stack:
+    agents = []
+    for spec in specs:
+      agent = make_agent(spec, rng.getrandbits(32))
+      if hasattr(agent, 'close'):
+        stack.callback(agent.close)
+      agents.append(agent)
+    while len(moves) < max_moves:
+      action = agents[env.player - 1].act(env)
+      moves.append(action_index(action))
+      _, reward, done = env.step(action)
+      if done:
+        result = reward
+        break
+  return {
+    'game': game_id,
+    'seed': seed,
+    'players': list(specs),
+    'max_moves': max_moves,
+    'result': result,
+    'moves': moves,
+  }
+
+
+def replay(record, env):
+  # Plays the recorded moves from the start position on env and checks that
+  # the game ends with the recorded result.
+  env.reset()
+  result = 0
+  for index in record['moves']:
+    action = index_action(index)
+    if action not in env.legal_actions():
+      raise AssertionError('game %d: illegal move %s' % (record['game'],
+                                                         action))
+    _, reward, done = env.step(action)
+    if done:
+      result = reward
+      break
+  if result != record['result']:
+    raise AssertionError('game %d: expected result %d, got %d' % (
+      record['game'], record['result'], result))
+  return env
+
+
+def reproduce(record):
+  # Whether playing the game again from its seed gives the same moves.
+  again = play_game(record['game'], record['players'], record['seed'],
+                    record.get('max_moves', len(record['moves'])))
+  return again['moves'] == record['moves']
+
+
+def replay_benchmark(records, engines=(Checkers, BitboardCheckers)):
+  # Steps per second of each engine replaying the same recorded games, so
+  # that only the speed of the rules code is measured.
+  num_steps = sum(len(record['moves']) for record in records)
+  for engine in engines:
+    env = engine()
+    start = time.perf_counter()
+    for record in records:
+      replay(record, env)
+    seconds = time.perf_counter() - start
+    print('%s: %d steps, %.0f steps/sec' % (engine.__name__, num_steps,
+                                            num_steps / seconds))
+
+
+# MCTS with the transposition table on, with and without tree reuse. Shared
+# statistics once left a root with fewer visits than its children.
+CHECK_SPECS = ('mcts:num_trials=20', 'mcts:num_trials=20,reuse_tree=False')
+
+
+def check(num_games=10, max_moves=200):
+  # Plays the CHECK_SPECS agents against random on both colours and replays
+  # every game on both engines.
+  records = []
+  for spec in CHECK_SPECS:
+    for game_id in range(num_games):
+      specs = ('random', spec) if game_id % 2 == 0 else (spec, 'random')
+      record = play_game(game_id, specs, game_id, max_moves)
+      for engine in (Checkers, BitboardCheckers):
+        replay(record, engine())
+      records.append(record)
+  return records
+
+
+def load_records(path):
+  with open(path) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+
+def elo(score):
+  score = min(max(score, 1e-3), 1 - 1e-3)
+  return 400 * math.log10(score / (1 - score))
+
+
+def summarize(records, spec_a, spec_b):
+  # Win/draw/loss of agent A by colour, and its Elo difference to agent B with
+  # a 95% confidence interval.
+  table = {1: [0, 0, 0], 2: [0, 0, 0]}
+  scores = []
+  for record in records:
+    color = 1 if record['game'] % 2 == 0 else 2
+    result = record['result'] if color == 1 else -record['result']
+    table[color][1 - result] += 1
+    scores.append((result + 1) / 2)
+
+  lines = ['%-12s %6s %6s %6s' % ('A plays as', 'win', 'draw', 'loss')]
+  for color in (1, 2):
+    lines.append('%-12s %6d %6d %6d' % (('player %d' % color,) +
+                                        tuple(table[color])))
+  total = [table[1][k] + table[2][k] for k in range(3)]
+  lines.append('%-12s %6d %6d %6d' % (('total',) + tuple(total)))
+
+  n = len(scores)
+  if n:
+    mean = sum(scores) / n
+    stderr = math.sqrt(sum((x - mean) ** 2 for x in scores) / n / n)
+    lines.append('A = %s, B = %s' % (spec_a, spec_b))
+    lines.append('score %.3f, Elo A - B: %+.0f (95%%: %+.0f .. %+.0f)' % (
+      mean, elo(mean), elo(mean - 1.96 * stderr), elo(mean + 1.96 * stderr)))
+  return '\n'.join(lines)
+
+
+def run_tournament(spec_a, spec_b, num_games, output, num_workers=None,
+                   seed=0, max_moves=200):
+  # Agent A is player 1 in even games and player 2 in odd games. Each game is
+  # seeded with seed + game number, so a run can be repeated game by game.
+  # Records are appended to output as JSON lines as soon as a game finishes.
+  records = []
+  with concurrent.futures.ProcessPoolExecutor(num_workers) as executor, \
+       open(output, 'a') as f:
+    futures = []
+    for game_id in range(num_games):
+      specs = (spec_a, spec_b) if game_id % 2 == 0 else (spec_b, spec_a)
+      futures.append(executor.submit(
+        play_game, game_id, specs, seed + game_id, max_moves))
+    for future in concurrent.futures.as_completed(futures):
+      record = future.result()
+      f.write(json.dumps(record, separators=(',', ':')) + '\n')
+      f.flush()
+      records.append(record)
+  return records
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('agent_a', nargs='?')
+  parser.add_argument('agent_b', nargs='?')
+  parser.add_argument('--games', type=int, default=100)
+  parser.add_argument('--workers', type=int, default=None)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--max_moves', type=int, default=200)
+  parser.add_argument('--output', default='games.jsonl')
+  parser.add_argument('--replay', metavar='GAMES_JSONL',
+                      help='replay a game log: check that the games are '
+                      'reproduced from their seeds and time both engines')
+  parser.add_argument('--check', action='store_true',
+                      help='play and replay short games of MCTS with the '
+                      'transposition table against random')
+  args = parser.parse_args()
+  if args.check:
+    print('%d games played and replayed.' % len(check()))
+    return
+  if args.replay:
+    records = load_records(args.replay)
+    reproduced = sum(reproduce(record) for record in records)
+    print('%d / %d games reproduced from their seeds' % (reproduced,
+                                                         len(records)))
+    replay_benchmark(records)
+    return
+  if args.agent_b is None:
+    parser.error('agent_a and agent_b are required')
+  records = run_tournament(args.agent_a, args.agent_b, args.games,
+                           args.output, args.workers, args.seed,
+                           args.max_moves)
+  print(summarize(records, args.agent_a, args.agent_b))
+
+
+if __name__ == '__main__':
+  main()
@@ -1,6 +1,8 @@
 import numpy as np
 import random
-import copy
+import time
+
+from observation import Observation, cell_bit, zobrist_table
 
 class HumanAgent:
   def __init__(self, game_cls):
@@ -19,76 +21,132 @@ class Connect4:
     self.board_height = board_height
     self.board_width = board_width
     self.cross_size = cross_size
-    self.board = np.zeros((board_height, board_width))
-    self.player = 0
+    self.zobrist = zobrist_table(board_height * board_width)
+    self.reset()
 
   @staticmethod
   def observation_hash(observation):
-    _, board = observation
-    return hash(np.array_str(board))
+    return observation.hash
 
   @staticmethod
   def legal_actions(observation):
-    _, board = observation
+    board = observation.board
     return list(np.where(board[0,:] == 0)[0])
 
   def reset(self):
-    self.board = np.zeros((self.board_height, self.board_width))
+    self.board = np.zeros((self.board_height, self.board_width),
+                          dtype=np.int8)
     self.player = 0
-    return (self.player, self.board)
+    self.num_moves = 0
+    self.last_move = None
+    self.hash = 0
+    self.key = 0
+    self.history = []
+    return self.observation()
+
+  def clone(self):
+    other = self.__class__.__new__(self.__class__)
+    other.__dict__.update(self.__dict__)
+    other.board = self.board.copy()
+    other.history = []
+    return other
 
   def observation(self):
-    return (self.player, self.board)
+    return Observation(self.player, self.key, self.board.shape, self.hash)
 
-  def step(self, action):
+  def legal_moves(self):
+    return [int(c) for c in np.flatnonzero(self.board[0] == 0)]
+
+  def push(self, action):
     i = self.board_height - 1
     while i >= 0 and self.board[i][action] != 0:
       i -= 1
     assert(i >= 0)
+    self.history.append(self.last_move)
     self.board[i][action] = self.player + 1
+    self.toggle(i, action, self.player + 1)
+    self.num_moves += 1
+    self.last_move = (i, action)
+    self.player = 1 - self.player
+
+  def pop(self):
+    i, j = self.last_move
+    self.player = 1 - self.player
+    self.board[i][j] = 0
+    self.toggle(i, j, self.player + 1)
+    self.num_moves -= 1
+    self.last_move = self.history.pop()
+
+  def toggle(self, i, j, value):
+    cell = i * self.board_width + j
+    self.hash ^= self.zobrist[cell][value]
+    self.key ^= cell_bit(cell, value, self.board_height * self.board_width)
+
+  def step(self, action):
+    mover = self.player
+    self.push(action)
     reward = 0
     done = self.is_finished()
     if done:
       if self.is_win():
-        reward = 1 - self.player
-    self.player = 1 - self.player
-    return (self.player, self.board), reward, done 
+        reward = 1 - mover
+    return self.observation(), reward, done
+
+  def terminal_value(self):
+    # From the point of view of the player who made the last move.
+    if self.is_win():
+      return 1
+    if self.num_moves == self.board_height * self.board_width:
+      return 0
+    return None
 
   def is_finished(self):
-    return np.all(self.board) or self.is_win()
+    return (self.num_moves == self.board_height * self.board_width or
+            self.is_win())
 
   def is_win(self):
-    p = self.player + 1
-
-    # Horizontal
-    for i in range(self.board_height):
-      for j in range(self.board_width - self.cross_size + 1):
-        if np.all(self.board[i, j:j + self.cross_size] == p):
-          return True
-
-    # Vertical
-    for i in range(self.board_height - self.cross_size + 1):
-      for j in range(self.board_width):
-        if np.all(self.board[i:i + self.cross_size, j] == p):
-          return True
-
-    # Diagonal
-    for i in range(self.board_height - self.cross_size + 1):
-      for j in range(self.board_width - self.cross_size + 1):
-        ii = [i + k for k in range(self.cross_size)]
-        jj = [j + k for k in range(self.cross_size)]
-        if np.all(self.board[ii, jj] == p):
-          return True
-
-    # Reverse diagonal
-    for i in range(self.cross_size - 1, self.board_height):
-      for j in range(self.cross_size - 1, self.board_width):
-        ii = [i - self.cross_size  + 1 + k for k in range(self.cross_size)]
-        jj = [j - k for k in range(self.cross_size)]
-        if np.all(self.board[ii, jj] == p):
-          return True
-
+    # Only lines through the last disc can have been completed by it.
+    if self.last_move is None:
+      return False
+    i, j = self.last_move
+    p = self.board[i, j]
+    for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+      count = 1
+      for d in (-1, 1):
+        ni, nj = i + d * di, j + d * dj
+        while (count < self.cross_size and
+               0 <= ni < self.board_height and 0 <= nj < self.board_width and
+               self.board[ni, nj] == p):
+          count += 1
+          ni += d * di
+          nj += d * dj
+      if count >= self.cross_size:
+        return True
     return False
 
   def __repr__(self):
     return np.array_str(self.board)
+
+
+def benchmark(sizes=((6, 7), (15, 15), (19, 19)), num_games=20):
+  # Per-move cost of step on random games; it should not grow with the
+  # board area.
+  rng = random.Random(0)
+  for height, width in sizes:
+    game = Connect4(height, width)
+    moves = 0
+    seconds = 0
+    for _ in range(num_games):
+      observation = game.reset()
+      done = False
+      while not done:
+        action = rng.choice(Connect4.legal_actions(observation))
+        start = time.perf_counter()
+        observation, _, done = game.step(action)
+        seconds += time.perf_counter() - start
+        moves += 1
+    print('%dx%d: %.1f us/move' % (height, width, 1e6 * seconds / moves))
+
+
+if __name__ == '__main__':
+  benchmark()
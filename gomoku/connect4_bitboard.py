@@ -0,0 +1,310 @@
+import numpy as np
+import random
+import sys
+import time
+
+from connect4 import Connect4
+from observation import Observation, cell_bit, zobrist_table
+
+
+class BitboardConnect4(Connect4):
+  # Columns are stored bottom-up in board_height + 1 bits each; the spare top
+  # bit keeps lines from wrapping into the next column. position holds the
+  # stones of the player to move, mask all stones. hash and key are kept up
+  # to date move by move as in Connect4.
+  def __init__(self, board_height=6, board_width=7, cross_size=4):
+    self.board_height = board_height
+    self.board_width = board_width
+    self.cross_size = cross_size
+    self.zobrist = zobrist_table(board_height * board_width)
+    self.column_bits = board_height + 1
+    self.bottom_mask = sum(1 << (c * self.column_bits)
+                           for c in range(board_width))
+    self.board_mask = self.bottom_mask * ((1 << board_height) - 1)
+    # Bit distance between neighbours: vertical, horizontal, both diagonals.
+    self.directions = (1, self.column_bits, board_height, board_height + 2)
+    self.reset()
+
+  def reset(self):
+    self.position = 0
+    self.mask = 0
+    self.heights = [0] * self.board_width
+    self.player = 0
+    self.num_moves = 0
+    self.hash = 0
+    self.key = 0
+    self.history = []
+    return self.observation()
+
+  def clone(self):
+    other = self.__class__.__new__(self.__class__)
+    other.__dict__.update(self.__dict__)
+    other.heights = list(self.heights)
+    other.history = []
+    return other
+
+  @property
+  def board(self):
+    board = np.zeros((self.board_height, self.board_width), dtype=np.int8)
+    stones = ((self.player, self.position),
+              (1 - self.player, self.position ^ self.mask))
+    for player, bb in stones:
+      for c in range(self.board_width):
+        for r in range(self.heights[c]):
+          if bb >> (c * self.column_bits + r) & 1:
+            board[self.board_height - 1 - r][c] = player + 1
+    return board
+
+  def observation(self):
+    return Observation(self.player, self.key,
+                       (self.board_height, self.board_width), self.hash)
+
+  def can_play(self, column):
+    return self.heights[column] < self.board_height
+
+  def legal_moves(self):
+    return [c for c in range(self.board_width) if self.can_play(c)]
+
+  def play(self, column):
+    # Drops a stone of the player to move; push and step switch players.
+    self.toggle(column, self.player + 1)
+    self.position ^= self.mask
+    self.mask |= self.mask + (1 << (column * self.column_bits))
+    self.heights[column] += 1
+    self.num_moves += 1
+
+  def undo(self, column):
+    self.heights[column] -= 1
+    self.num_moves -= 1
+    self.mask ^= 1 << (column * self.column_bits + self.heights[column])
+    self.position ^= self.mask
+    self.toggle(column, self.player + 1)
+
+  def toggle(self, column, value):
+    # Adds or removes the top stone of a column in hash and key, with cells
+    # numbered like Connect4's board rows.
+    cell = ((self.board_height - 1 - self.heights[column]) * self.board_width +
+            column)
+    self.hash ^= self.zobrist[cell][value]
+    self.key ^= cell_bit(cell, value, self.board_height * self.board_width)
+
+  def push(self, column):
+    self.play(column)
+    self.history.append(column)
+    self.player = 1 - self.player
+
+  def pop(self):
+    self.player = 1 - self.player
+    self.undo(self.history.pop())
+
+  def step(self, action):
+    assert self.can_play(action)
+    self.play(action)
+    reward = 0
+    done = self.is_finished()
+    if done:
+      if self.is_win():
+        reward = 1 - self.player
+    self.player = 1 - self.player
+    return self.observation(), reward, done
+
+  def is_finished(self):
+    return (self.num_moves == self.board_height * self.board_width or
+            self.is_win())
+
+  def terminal_value(self):
+    if self.is_win():
+      return 1
+    if self.num_moves == self.board_height * self.board_width:
+      return 0
+    return None
+
+  def is_win(self):
+    # Whether the player who made the last move has a line.
+    return self.alignment(self.position ^ self.mask)
+
+  def alignment(self, bb):
+    for s in self.directions:
+      m = bb
+      for t in range(1, self.cross_size):
+        m &= bb >> (t * s)
+      if m:
+        return True
+    return False
+
+  def __repr__(self):
+    return np.array_str(self.board)
+
+
+class Connect4Solver:
+  # Negamax with alpha-beta, a fixed-size transposition table of upper
+  # bounds, center-first move ordering refined by the number of threats a
+  # move creates, and a null-window search on the score. A score is positive
+  # when the side to move wins; the larger it is, the sooner.
+  def __init__(self, table_size=(1 << 20) + 7):
+    self.table_size = table_size
+    self.keys = [None] * table_size
+    self.values = [0] * table_size
+    self.nodes = 0
+
+  def winning_position(self, game, position, mask):
+    # Empty cells that would complete a line for the stones in position.
+    r = 0
+    k = game.cross_size
+    for s in game.directions:
+      for t in range(k):
+        m = -1
+        for u in range(k):
+          if u < t:
+            m &= position << ((t - u) * s)
+          elif u > t:
+            m &= position >> ((u - t) * s)
+        r |= m
+    return r & (game.board_mask ^ mask)
+
+  def non_losing_moves(self, game, position, mask):
+    possible = (mask + game.bottom_mask) & game.board_mask
+    opponent_win = self.winning_position(game, position ^ mask, mask)
+    forced = possible & opponent_win
+    if forced:
+      if forced & (forced - 1):
+        return 0
+      possible = forced
+    return possible & ~(opponent_win >> 1)
+
+  def solve(self, game):
+    self.nodes = 0
+    self.game = game
+    self.cells = game.board_height * game.board_width
+    self.order = sorted(range(game.board_width),
+                        key=lambda c: abs(2 * c - game.board_width + 1))
+    self.columns = [((1 << game.board_height) - 1) << (c * game.column_bits)
+                    for c in self.order]
+    position, mask, moves = game.position, game.mask, game.num_moves
+    possible = (mask + game.bottom_mask) & game.board_mask
+    if self.winning_position(game, position, mask) & possible:
+      return (self.cells + 1 - moves) // 2
+
+    lo, hi = -((self.cells - moves) // 2), (self.cells + 1 - moves) // 2
+    while lo < hi:
+      med = lo + (hi - lo) // 2
+      if med <= 0 and int(lo / 2) < med:
+        med = int(lo / 2)
+      elif med >= 0 and hi // 2 > med:
+        med = hi // 2
+      r = self.negamax(position, mask, moves, med, med + 1)
+      if r <= med:
+        hi = r
+      else:
+        lo = r
+    return lo
+
+  def negamax(self, position, mask, moves, alpha, beta):
+    # Assumes the side to move cannot win immediately.
+    self.nodes += 1
+    game = self.game
+    moves_left = self.non_losing_moves(game, position, mask)
+    if not moves_left:
+      return -((self.cells - moves) // 2)
+    if moves >= self.cells - 2:
+      return 0
+
+    lower = -((self.cells - 2 - moves) // 2)
+    if alpha < lower:
+      alpha = lower
+      if alpha >= beta:
+        return alpha
+    upper = (self.cells - 1 - moves) // 2
+    key = position + mask
+    slot = key % self.table_size
+    if self.keys[slot] == key:
+      upper = self.values[slot]
+    if beta > upper:
+      beta = upper
+      if alpha >= beta:
+        return beta
+
+    candidates = []
+    for i, column in enumerate(self.columns):
+      move = moves_left & column
+      if move:
+        threats = self.winning_position(game, position | move, mask)
+        candidates.append((-bin(threats).count('1'), i, move))
+    candidates.sort()
+
+    for _, _, move in candidates:
+      score = -self.negamax(position ^ mask, mask | move, moves + 1,
+                            -beta, -alpha)
+      if score >= beta:
+        return score
+      if score > alpha:
+        alpha = score
+
+    self.keys[slot] = key
+    self.values[slot] = alpha
+    return alpha
+
+  def best_move(self, game):
+    # Column with the best solved score for the side to move.
+    cells = game.board_height * game.board_width
+    best, best_score = None, None
+    for column in game.legal_moves():
+      game.play(column)
+      if game.is_win():
+        score = (cells + 2 - game.num_moves) // 2
+      elif game.num_moves == cells:
+        score = 0
+      else:
+        score = -self.solve(game)
+      game.undo(column)
+      if best_score is None or score > best_score:
+        best, best_score = column, score
+    return best, best_score
+
+
+class SolverAgent:
+  def __init__(self, table_size=(1 << 20) + 7):
+    self.solver = Connect4Solver(table_size)
+
+  def act(self, observation, env):
+    return self.solver.best_move(env)[0]
+
+
+def quiet_opening(num_moves, rng):
+  # Random opening in which nobody can win on the next move, so the solver
+  # has actual work to do.
+  game = BitboardConnect4()
+  solver = Connect4Solver(table_size=1)
+  while game.num_moves < num_moves:
+    candidates = []
+    for column in game.legal_moves():
+      game.play(column)
+      possible = (game.mask + game.bottom_mask) & game.board_mask
+      threats = solver.winning_position(game, game.position, game.mask)
+      if not game.is_win() and not threats & possible:
+        candidates.append(column)
+      game.undo(column)
+    if not candidates:
+      return None
+    game.step(rng.choice(candidates))
+  return game
+
+
+def main():
+  # Solves positions after a number of random opening moves.
+  num_moves = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+  rng = random.Random(0)
+  solver = Connect4Solver()
+  for _ in range(5):
+    game = quiet_opening(num_moves, rng)
+    if game is None:
+      continue
+    start = time.perf_counter()
+    score = solver.solve(game)
+    seconds = time.perf_counter() - start
+    print('%s\nscore %d, %d nodes, %.2f s, %.0f nodes/sec' % (
+      game, score, solver.nodes, seconds, solver.nodes / seconds))
+
+
+if __name__ == '__main__':
+  main()
@@ -1,77 +1,110 @@
 import numpy as np
 import random
-import copy  
+import time
+
+from observation import Observation, cell_bit, zobrist_table
 
 
 class Gomoku:
   def __init__(self, board_size=3, cross_size=3):
     self.board_size = board_size
     self.cross_size = cross_size
-    self.board = np.zeros((board_size, board_size))
-    self.player = 0
+    self.zobrist = zobrist_table(board_size * board_size)
+    self.reset()
 
   @staticmethod
   def observation_hash(observation):
-    _, board = observation
-    return hash(np.array_str(board))
+    return observation.hash
 
   @staticmethod
   def legal_actions(observation):
-    _, board = observation
+    board = observation.board
     return list(zip(*np.where(board == 0)))
 
   def reset(self):
-    self.board = np.zeros((self.board_size, self.board_size))
+    self.board = np.zeros((self.board_size, self.board_size), dtype=np.int8)
     self.player = 0
-    return (self.player, self.board)
+    self.num_moves = 0
+    self.last_move = None
+    self.hash = 0
+    self.key = 0
+    self.history = []
+    return self.observation()
+
+  def clone(self):
+    other = self.__class__.__new__(self.__class__)
+    other.__dict__.update(self.__dict__)
+    other.board = self.board.copy()
+    other.history = []
+    return other
 
   def observation(self):
-    return (self.player, self.board)
+    return Observation(self.player, self.key, self.board.shape, self.hash)
+
+  def legal_moves(self):
+    return [tuple(ij) for ij in np.argwhere(self.board == 0).tolist()]
+
+  def push(self, action):
+    i, j = action
+    self.history.append(self.last_move)
+    self.board[i, j] = self.player + 1
+    self.toggle(i, j, self.player + 1)
+    self.num_moves += 1
+    self.last_move = action
+    self.player = 1 - self.player
+
+  def pop(self):
+    i, j = self.last_move
+    self.player = 1 - self.player
+    self.board[i, j] = 0
+    self.toggle(i, j, self.player + 1)
+    self.num_moves -= 1
+    self.last_move = self.history.pop()
+
+  def toggle(self, i, j, value):
+    cell = i * self.board_size + j
+    self.hash ^= self.zobrist[cell][value]
+    self.key ^= cell_bit(cell, value, self.board_size ** 2)
 
   def step(self, action):
-    self.board[action] = self.player + 1
+    mover = self.player
+    self.push(action)
     reward = 0
     done = self.is_finished()
     if done:
       if self.is_win():
-        reward = 1 - self.player
-    self.player = 1 - self.player
-    return (self.player, self.board), reward, done 
+        reward = 1 - mover
+    return self.observation(), reward, done
+
+  def terminal_value(self):
+    # From the point of view of the player who made the last move.
+    if self.is_win():
+      return 1
+    if self.num_moves == self.board_size ** 2:
+      return 0
+    return None
 
   def is_finished(self):
-    return np.all(self.board) or self.is_win()
+    return self.num_moves == self.board_size ** 2 or self.is_win()
 
   def is_win(self):
-    p = self.player + 1
-
-    # Horizontal
-    for i in range(self.board_size):
-      for j in range(self.board_size - self.cross_size + 1):
-        if np.all(self.board[i, j:j + self.cross_size] == p):
-          return True
-
-    # Vertical
-    for i in range(self.board_size - self.cross_size + 1):
-      for j in range(self.board_size):
-        if np.all(self.board[i:i + self.cross_size, j] == p):
-          return True
-
-    # Diagonal
-    for i in range(self.board_size - self.cross_size + 1):
-      for j in range(self.board_size - self.cross_size + 1):
-        ii = [i + k for k in range(self.cross_size)]
-        jj = [j + k for k in range(self.cross_size)]
-        if np.all(self.board[ii, jj] == p):
-          return True
-
-    # Reverse diagonal
-    for i in range(self.cross_size - 1, self.board_size):
-      for j in range(self.cross_size - 1, self.board_size):
-        ii = [i - self.cross_size  + 1 + k for k in range(self.cross_size)]
-        jj = [j - k for k in range(self.cross_size)]
-        if np.all(self.board[ii, jj] == p):
-          return True
-
+    # Only lines through the last stone can have been completed by it.
+    if self.last_move is None:
+      return False
+    i, j = self.last_move
+    p = self.board[i, j]
+    for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+      count = 1
+      for d in (-1, 1):
+        ni, nj = i + d * di, j + d * dj
+        while (count < self.cross_size and
+               0 <= ni < self.board_size and 0 <= nj < self.board_size and
+               self.board[ni, nj] == p):
+          count += 1
+          ni += d * di
+          nj += d * dj
+      if count >= self.cross_size:
+        return True
     return False
 
   def __repr__(self):
@@ -88,3 +121,27 @@ class HumanAgent:
     return ij
 
 
+def benchmark(sizes=(9, 15, 19), cross_size=5, num_games=20):
+  # Per-move cost of step on random games; it should not grow with the
+  # board area.
+  rng = random.Random(0)
+  for size in sizes:
+    game = Gomoku(size, cross_size)
+    moves = 0
+    seconds = 0
+    for _ in range(num_games):
+      observation = game.reset()
+      actions = Gomoku.legal_actions(observation)
+      rng.shuffle(actions)
+      for action in actions:
+        start = time.perf_counter()
+        _, _, done = game.step(action)
+        seconds += time.perf_counter() - start
+        moves += 1
+        if done:
+          break
+    print('%dx%d: %.1f us/move' % (size, size, 1e6 * seconds / moves))
+
+
+if __name__ == '__main__':
+  benchmark()
@@ -0,0 +1,101 @@
+import collections
+import functools
+import random
+import sys
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_table(num_cells):
+  # ZOBRIST[cell][value]: random keys for stones of player 1 and 2; empty
+  # cells hash to 0, so a position's hash is the xor over its stones.
+  rng = random.Random(2024)
+  return tuple((0, rng.getrandbits(64), rng.getrandbits(64))
+               for _ in range(num_cells))
+
+
+def zobrist_hash(board):
+  table = zobrist_table(board.size)
+  h = 0
+  for cell, value in enumerate(board.flat):
+    h ^= table[cell][value]
+  return h
+
+
+def cell_bit(cell, value, num_cells):
+  # Boards are packed into one int with a bit plane per player, so a stone
+  # is added or removed by xoring this bit.
+  return 1 << int(cell + (value - 1) * num_cells)
+
+
+def pack(board):
+  bits = np.stack((board == 1, board == 2)).ravel()
+  return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(),
+                        'little')
+
+
+def unpack(key, shape):
+  num_cells = shape[0] * shape[1]
+  data = key.to_bytes((2 * num_cells + 7) // 8, 'little')
+  bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8),
+                       count=2 * num_cells, bitorder='little')
+  bits = bits.reshape((2,) + tuple(shape)).astype(np.int8)
+  return bits[0] + 2 * bits[1]
+
+
+class Observation(collections.namedtuple('Observation',
+                                         'player key shape hash')):
+  # Immutable snapshot of a board game position: the side to move, the
+  # packed board (see cell_bit) and the board's Zobrist hash, which the game
+  # keeps up to date move by move. Equal positions compare and hash equal, so
+  # observations can be stored in sets, dicts and replay buffers directly.
+  __slots__ = ()
+
+  def __hash__(self):
+    return self.hash
+
+  def __eq__(self, other):
+    if not isinstance(other, Observation):
+      return NotImplemented
+    return ((self.player, self.key, tuple(self.shape)) ==
+            (other.player, other.key, tuple(other.shape)))
+
+  def __ne__(self, other):
+    # Needed: tuple's own __ne__ would compare every field, hash included.
+    equal = self.__eq__(other)
+    return equal if equal is NotImplemented else not equal
+
+  @property
+  def board(self):
+    return unpack(self.key, self.shape)
+
+
+def main():
+  # Random games checking that the incremental hash and the packed board
+  # match the live board, and comparing snapshot sizes.
+  from connect4 import Connect4
+  from connect4_bitboard import BitboardConnect4
+  from gomoku import Gomoku
+  rng = random.Random(0)
+  for game in (Gomoku(15, 5), Connect4(), BitboardConnect4()):
+    seen = set()
+    for _ in range(20):
+      observation = game.reset()
+      done = False
+      while not done:
+        action = rng.choice(game.legal_actions(observation))
+        observation, _, done = game.step(action)
+        assert (observation.board == game.board).all()
+        assert observation.hash == zobrist_hash(game.board)
+        assert observation.key == pack(game.board)
+        seen.add(observation)
+    key_bytes = sys.getsizeof(observation.key)
+    float_bytes = sys.getsizeof(game.board.astype(np.float64))
+    print('%s: %d positions, %d bytes per board instead of %d (%.0fx)' % (
+      type(game).__name__, len(seen), key_bytes, float_bytes,
+      float_bytes / key_bytes))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,320 @@
+import sys
+import time
+
+from gomoku import Gomoku
+
+
+WIN = 1000000
+
+
+class Timeout(Exception):
+  pass
+
+
+def _lines(board_size, cross_size):
+  # Every window of cross_size cells along the four directions, and for each
+  # cell the windows it belongs to and its neighbours within two cells.
+  windows = []
+  for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+    for i in range(board_size):
+      for j in range(board_size):
+        ei, ej = i + (cross_size - 1) * di, j + (cross_size - 1) * dj
+        if 0 <= ei < board_size and 0 <= ej < board_size:
+          windows.append(tuple((i + t * di) * board_size + j + t * dj
+                               for t in range(cross_size)))
+  cell_windows = [[] for _ in range(board_size * board_size)]
+  for w, cells in enumerate(windows):
+    for c in cells:
+      cell_windows[c].append(w)
+  near = []
+  for i in range(board_size):
+    for j in range(board_size):
+      near.append([ni * board_size + nj
+                   for ni in range(max(0, i - 2), min(board_size, i + 3))
+                   for nj in range(max(0, j - 2), min(board_size, j + 3))
+                   if (ni, nj) != (i, j)])
+  return windows, cell_windows, near
+
+
+class PatternBoard:
+  # Gomoku position with pattern counts kept up to date on every place and
+  # remove: for each window the number of stones of each player, per player
+  # how many windows hold m of its stones and none of the opponent's, and the
+  # windows that are one stone short of a line (fours) or two (threes).
+  # Players are 1 and 2, cells are flat indices.
+  def __init__(self, board_size, cross_size):
+    self.board_size = board_size
+    self.cross_size = cross_size
+    # Value of a window holding m stones of one player and none of the other.
+    self.window_values = ([0] + [10 ** k for k in range(cross_size - 1)] +
+                          [WIN])
+    self.windows, self.cell_windows, self.near = _lines(board_size,
+                                                        cross_size)
+    self.cells = [0] * (board_size * board_size)
+    self.window_counts = [[0, 0, 0] for _ in self.windows]
+    self.counts = [None] + [[len(self.windows)] + [0] * cross_size
+                            for _ in (1, 2)]
+    self.fours = [None, set(), set()]
+    self.threes = [None, set(), set()]
+    self.neighbours = [0] * len(self.cells)
+    self.stones = []
+
+  def _classify(self, w, sign):
+    counts = self.window_counts[w]
+    for p in (1, 2):
+      if counts[3 - p] == 0:
+        m = counts[p]
+        self.counts[p][m] += sign
+        if m == self.cross_size - 1:
+          (self.fours[p].add if sign > 0 else self.fours[p].discard)(w)
+        elif m == self.cross_size - 2:
+          (self.threes[p].add if sign > 0 else self.threes[p].discard)(w)
+
+  def place(self, c, p):
+    self.cells[c] = p
+    self.stones.append(c)
+    for w in self.cell_windows[c]:
+      self._classify(w, -1)
+      self.window_counts[w][p] += 1
+      self._classify(w, 1)
+    for n in self.near[c]:
+      self.neighbours[n] += 1
+
+  def remove(self, c):
+    # Stones are removed in the reverse order they were placed.
+    self.stones.pop()
+    p = self.cells[c]
+    self.cells[c] = 0
+    for w in self.cell_windows[c]:
+      self._classify(w, -1)
+      self.window_counts[w][p] -= 1
+      self._classify(w, 1)
+    for n in self.near[c]:
+      self.neighbours[n] -= 1
+
+  def rewind(self, num_stones):
+    while len(self.stones) > num_stones:
+      self.remove(self.stones[-1])
+
+  def has_five(self, p):
+    return self.counts[p][self.cross_size] > 0
+
+  def winning_cells(self, p):
+    # Empty cells where p completes a line.
+    return {c for w in self.fours[p] for c in self.windows[w]
+            if not self.cells[c]}
+
+  def four_moves(self, p):
+    # Empty cells where p makes a four.
+    return {c for w in self.threes[p] for c in self.windows[w]
+            if not self.cells[c]}
+
+  def candidates(self):
+    if not self.stones:
+      center = self.board_size // 2
+      return [center * self.board_size + center]
+    return [c for c, n in enumerate(self.neighbours)
+            if n and not self.cells[c]]
+
+  def move_score(self, c, p):
+    # How much a stone at c helps p (attack) plus how much it blocks the
+    # opponent (defence).
+    values = self.window_values
+    score = 0
+    for w in self.cell_windows[c]:
+      counts = self.window_counts[w]
+      if not counts[3 - p]:
+        score += values[counts[p] + 1]
+      if not counts[p]:
+        score += values[counts[3 - p] + 1] // 2
+    return score
+
+  def evaluate(self, p):
+    q = 3 - p
+    return sum(self.window_values[m] *
+               (self.counts[p][m] - self.counts[q][m])
+               for m in range(1, self.cross_size))
+
+
+class ThreatSpaceAgent:
+  # Plays immediate wins and blocks, then looks for a forced win by a
+  # sequence of fours (threat-space search restricted to fours, where the
+  # defender's reply is forced), then falls back to iterative-deepening
+  # negamax over the best-scoring cells near existing stones. Each move
+  # stays within time_limit seconds; counters for the last move are kept in
+  # self.stats. The line length is taken from env when act gets one,
+  # otherwise cross_size has to be given.
+  def __init__(self, time_limit=1.0, max_width=10, max_threat_depth=12,
+               cross_size=None):
+    self.time_limit = time_limit
+    self.cross_size = cross_size
+    self.max_width = max_width
+    self.max_threat_depth = max_threat_depth
+    self.position = None
+    self.stats = {}
+
+  def sync(self, board):
+    # Places the stones added since the last seen board, or starts over when
+    # the board is not a continuation of it (a new game).
+    size = board.shape[0]
+    cells = [int(v) for v in board.flat]
+    position = self.position
+    if (position is None or position.board_size != size or
+        position.cross_size != self.cross_size or
+        any(old and old != new for old, new in zip(position.cells, cells))):
+      position = self.position = PatternBoard(size, self.cross_size)
+    for c, (old, new) in enumerate(zip(position.cells, cells)):
+      if new and not old:
+        position.place(c, new)
+
+  def act(self, observation, env=None):
+    if env is not None:
+      self.cross_size = env.cross_size
+    if self.cross_size is None:
+      raise ValueError('cross_size is needed when act gets no env')
+    start = time.perf_counter()
+    self.deadline = start + self.time_limit
+    self.nodes = 0
+    self.sync(observation.board)
+    self.num_stones = len(self.position.stones)
+    move, reason = self.choose(observation.player + 1)
+    seconds = time.perf_counter() - start
+    self.stats = {
+      'reason': reason,
+      'nodes': self.nodes,
+      'seconds': seconds,
+      'nodes_per_sec': self.nodes / seconds if seconds > 0 else 0,
+    }
+    size = self.position.board_size
+    return (move // size, move % size)
+
+  def choose(self, p):
+    position = self.position
+    q = 3 - p
+    wins = position.winning_cells(p)
+    if wins:
+      return min(wins), 'five'
+    blocks = position.winning_cells(q)
+    if blocks:
+      return max(blocks, key=lambda c: position.move_score(c, p)), 'block'
+    try:
+      move = self.threat_search(p, self.max_threat_depth)
+      if move is not None:
+        return move, 'threat'
+    except Timeout:
+      # A timeout leaves the search's stones on the board.
+      self.position.rewind(self.num_stones)
+
+    candidates = self.ordered(p)
+    best = candidates[0]
+    depth = 1
+    try:
+      while True:
+        best = self.negamax_root(p, depth, candidates, best)
+        depth += 1
+    except Timeout:
+      self.position.rewind(self.num_stones)
+    return best, 'search depth %d' % (depth - 1)
+
+  def tick(self):
+    self.nodes += 1
+    if self.nodes % 64 == 0 and time.perf_counter() >= self.deadline:
+      raise Timeout()
+
+  def threat_search(self, p, depth):
+    # First move of a forced win for p by consecutive fours, or None.
+    self.tick()
+    position = self.position
+    q = 3 - p
+    if position.winning_cells(p):
+      return min(position.winning_cells(p))
+    if depth == 0 or position.winning_cells(q):
+      return None
+    for c in position.four_moves(p):
+      position.place(c, p)
+      wins = position.winning_cells(p)
+      found = False
+      if len(wins) >= 2:
+        found = True
+      elif len(wins) == 1:
+        reply = wins.pop()
+        position.place(reply, q)
+        if not position.has_five(q):
+          found = self.threat_search(p, depth - 1) is not None
+        position.remove(reply)
+      position.remove(c)
+      if found:
+        return c
+    return None
+
+  def ordered(self, p):
+    position = self.position
+    candidates = position.candidates()
+    candidates.sort(key=lambda c: position.move_score(c, p), reverse=True)
+    return candidates[:self.max_width]
+
+  def negamax_root(self, p, depth, candidates, previous):
+    position = self.position
+    order = [previous] + [c for c in candidates if c != previous]
+    alpha, best = -WIN - 1, previous
+    for c in order:
+      position.place(c, p)
+      if position.has_five(p):
+        score = WIN
+      else:
+        score = -self.negamax(3 - p, depth - 1, -WIN - 1, -alpha)
+      position.remove(c)
+      if score > alpha:
+        alpha, best = score, c
+    return best
+
+  def negamax(self, p, depth, alpha, beta):
+    self.tick()
+    position = self.position
+    if depth == 0:
+      return position.evaluate(p)
+    candidates = self.ordered(p)
+    if not candidates:
+      return 0
+    best = -WIN - 1
+    for c in candidates:
+      position.place(c, p)
+      if position.has_five(p):
+        score = WIN
+      else:
+        score = -self.negamax(3 - p, depth - 1, -beta, -alpha)
+      position.remove(c)
+      if score > best:
+        best = score
+      if best > alpha:
+        alpha = best
+      if alpha >= beta:
+        break
+    return best
+
+
+def main():
+  # Self-play on a 15x15 board, reporting the search throughput and the
+  # slowest move.
+  time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+  game = Gomoku(board_size=15, cross_size=5)
+  agents = [ThreatSpaceAgent(time_limit), ThreatSpaceAgent(time_limit)]
+  observation = game.reset()
+  done = False
+  nodes, seconds, slowest = 0, 0, 0
+  while not done:
+    agent = agents[game.player]
+    action = agent.act(observation, game)
+    nodes += agent.stats['nodes']
+    seconds += agent.stats['seconds']
+    slowest = max(slowest, agent.stats['seconds'])
+    print('move %d: %s (%s)' % (game.num_moves + 1, action,
+                                agent.stats['reason']))
+    observation, reward, done = game.step(action)
+  print(game)
+  print('%d moves, %.0f nodes/sec, slowest move %.3f s' % (
+    game.num_moves, nodes / seconds, slowest))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,128 @@
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[1:1] = [os.path.join(ROOT, 'checkers'), os.path.join(ROOT, 'gomoku')]
+
+from bitboard import BitboardCheckers
+from connect4 import Connect4
+from connect4_bitboard import BitboardConnect4
+from engine import EngineAgent, MCTS
+from gomoku import Gomoku
+from main import Checkers, MCTSAgent
+from perft import POSITIONS, load
+
+
+def check_protocol(game, rng, num_games=5):
+  # push/pop must restore the position and hash exactly.
+  for _ in range(num_games):
+    start = (game.hash, game.player)
+    depth = 0
+    while game.terminal_value() is None and game.legal_moves():
+      game.push(rng.choice(game.legal_moves()))
+      depth += 1
+      if depth > 300:
+        break
+    for _ in range(depth):
+      game.pop()
+    assert (game.hash, game.player) == start
+
+
+def compare_checkers(games, depth):
+  # Both checkers engines must agree on legal_moves and terminal_value in
+  # every position up to depth plies, restoring them with pop.
+  values = [game.terminal_value() for game in games]
+  moves = [game.legal_moves() for game in games]
+  if values[0] != values[1] or moves[0] != moves[1]:
+    raise AssertionError('engines differ: %s %s\n%s' % (values, moves,
+                                                         games[0]))
+  if values[0] is not None or depth == 0:
+    return
+  for move in moves[0]:
+    for game in games:
+      game.push(move)
+    compare_checkers(games, depth - 1)
+    for game in games:
+      game.pop()
+
+
+def check_checkers(depth=5):
+  # The perft positions include a multi-jump in progress, where the mover
+  # has a capture left.
+  for position, _ in POSITIONS.values():
+    compare_checkers([load(Checkers(), position),
+                      load(BitboardCheckers(), position)], depth)
+
+
+def benchmark(seconds):
+  # The same engine on every game, reporting playouts/sec from the start
+  # position.
+  rng = random.Random(0)
+  check_checkers()
+  games = [Checkers(), BitboardCheckers(), Gomoku(9, 5), Connect4(),
+           BitboardConnect4()]
+  for game in games:
+    game.reset()
+    check_protocol(game, rng)
+    engine = MCTS(rng=random.Random(0))
+    engine.search(game, time_limit=seconds)
+    print('%-18s %6d playouts, %7d nodes, %6.0f playouts/sec, best %s' % (
+      type(game).__name__, engine.stats['playouts'], engine.stats['nodes'],
+      engine.stats['playouts_per_sec'], engine.best_move()))
+
+
+def memory_benchmark(num_trials, max_memory=1 << 20):
+  # Bytes per node of the array tree for playouts from the checkers start
+  # position, and the tree MCTSAgent builds on it with its transposition
+  # table for the same number of playouts.
+  game = Checkers()
+  engine = MCTS(rng=random.Random(0), capacity=1024)
+  engine.search(game, num_trials=num_trials)
+  print('MCTS arrays:  %d nodes, %.0f bytes/node (%d allocated)' % (
+    engine.num_nodes, engine.memory_usage() / engine.num_nodes,
+    engine.capacity))
+
+  agent = MCTSAgent(num_trials=num_trials, reuse_tree=False, seed=0)
+  agent.search(game)
+  engine = agent.engine
+  print('MCTSAgent:    %d nodes, %d bytes/node, %d table entries' % (
+    engine.num_nodes, engine.node_bytes(), len(engine.table)))
+
+  engine = MCTS(rng=random.Random(0), capacity=1024, max_memory=max_memory)
+  engine.search(BitboardConnect4(), time_limit=2)
+  print('Connect4 within %d bytes: %d nodes, %d playouts, %d bytes used' % (
+    max_memory, engine.num_nodes, engine.stats['playouts'],
+    engine.memory_usage()))
+
+
+def play(game, agents, max_moves=200):
+  # Returns 0 or 1 for the winner's index in agents, None for a draw.
+  game.reset()
+  movers = []
+  for _ in range(max_moves):
+    movers.append(game.player)
+    game.push(agents[len(movers) % 2 - 1].act(game))
+    if game.terminal_value() is not None:
+      return (len(movers) - 1) % 2 if game.terminal_value() else None
+  return None
+
+
+def main():
+  seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+  benchmark(seconds)
+  memory_benchmark(300, max_memory=1 << 18)
+  # Sanity check: more playouts should beat fewer.
+  strong = EngineAgent(num_trials=400, rng=random.Random(1))
+  weak = EngineAgent(num_trials=20, rng=random.Random(2))
+  wins = 0
+  for k in range(6):
+    agents = [strong, weak] if k % 2 == 0 else [weak, strong]
+    winner = play(Connect4(), agents)
+    wins += winner is not None and agents[winner] is strong
+  print('Connect4: 400 playouts beat 20 playouts in %d of 6 games' % wins)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,157 @@
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import MCTS
+
+
+# A book is a .npy array of RECORD sorted by key, one record per position:
+# the position's hash, its book move and the number of playouts behind it.
+# Loading memory-maps the file, a lookup is a binary search on the keys.
+RECORD = np.dtype([('key', '<u8'), ('move', '<u8'), ('playouts', '<u4')])
+
+
+def encode_move(move):
+  # Moves are ints or short tuples of ints below 256 (a Connect4 column, a
+  # Gomoku cell, a checkers (i, j, ni, nj)); tuples keep their length in the
+  # top byte.
+  if isinstance(move, tuple):
+    code = len(move) << 56
+    for k, v in enumerate(move):
+      code |= int(v) << (8 * k)
+    return code
+  return int(move)
+
+
+def decode_move(code):
+  length = code >> 56
+  if not length:
+    return code
+  return tuple(code >> (8 * k) & 255 for k in range(length))
+
+
+class OpeningBook:
+  def __init__(self, path):
+    self.path = path
+    self.records = None
+
+  def load(self):
+    if self.records is None:
+      if os.path.exists(self.path):
+        self.records = np.load(self.path, mmap_mode='r')
+      else:
+        self.records = np.zeros(0, dtype=RECORD)
+    return self.records
+
+  def __len__(self):
+    return len(self.load())
+
+  def lookup(self, game):
+    # Book move for the position in game, or None.
+    records = self.load()
+    keys = records['key']
+    key = np.uint64(game.hash & 0xFFFFFFFFFFFFFFFF)
+    k = int(np.searchsorted(keys, key))
+    if k == len(keys) or keys[k] != key:
+      return None
+    return decode_move(int(records['move'][k]))
+
+
+def mcts_ranking(num_trials, rng=None):
+  # Moves ranked by visits after an MCTS search of num_trials playouts.
+  engine = MCTS(rng=rng)
+
+  def ranking(game):
+    engine.search(game, num_trials)
+    children = sorted(engine.children(), key=lambda child:
+                      -engine.visit_count(child))
+    return [engine.move(child) for child in children], num_trials
+
+  return ranking
+
+
+def build_book(game, ranking, depth, width, path):
+  # Searches every position reached by following the width best-ranked moves
+  # of each position, for both sides, up to depth plies from the start and
+  # writes the best move of each to path. ranking(game) returns (moves best
+  # first, playouts spent).
+  entries = {}
+
+  def visit(d):
+    key = game.hash & 0xFFFFFFFFFFFFFFFF
+    if key in entries or game.terminal_value() is not None:
+      return
+    moves, playouts = ranking(game)
+    entries[key] = (encode_move(moves[0]), playouts)
+    if d + 1 < depth:
+      for move in moves[:width]:
+        game.push(move)
+        visit(d + 1)
+        game.pop()
+
+  visit(0)
+  records = np.zeros(len(entries), dtype=RECORD)
+  for k, key in enumerate(sorted(entries)):
+    records[k] = (key,) + entries[key]
+  np.save(path, records)
+  return records
+
+
+class BookAgent:
+  # Plays the book move when there is one, otherwise asks the fallback agent.
+  # Works with both act(env) and act(observation, env).
+  def __init__(self, path, fallback):
+    self.book = OpeningBook(path)
+    self.fallback = fallback
+    self.book_moves = 0
+
+  def act(self, observation, env=None):
+    game = observation if env is None else env
+    move = self.book.lookup(game)
+    if move is None:
+      return (self.fallback.act(observation) if env is None else
+              self.fallback.act(observation, env))
+    self.book_moves += 1
+    return move
+
+
+def main():
+  # Builds books for Checkers and Connect4 from MCTS searches and times book
+  # moves against searching.
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  sys.path[1:1] = [os.path.join(root, 'checkers'),
+                   os.path.join(root, 'gomoku')]
+  from connect4 import Connect4
+  from engine import EngineAgent
+  from main import Checkers
+
+  num_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  depth = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+  directory = os.path.join(root, 'mcts', 'books')
+  os.makedirs(directory, exist_ok=True)
+  for game in (Checkers(), Connect4()):
+    name = type(game).__name__.lower()
+    path = os.path.join(directory, name + '.npy')
+    start = time.perf_counter()
+    records = build_book(game, mcts_ranking(num_trials, random.Random(0)),
+                         depth, width=3, path=path)
+    print('%s: %d positions, %d bytes, built in %.1f s' % (
+      name, len(records), records.nbytes, time.perf_counter() - start))
+
+    agent = BookAgent(path, EngineAgent(num_trials=num_trials))
+    game.reset()
+    start = time.perf_counter()
+    move = agent.act(game)
+    book_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    searched = agent.fallback.act(game)
+    print('%s: book move %s in %.0f us, search %s in %.2f s' % (
+      name, move, 1e6 * book_seconds, searched,
+      time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,401 @@
+import array
+import math
+import random
+import time
+
+
+# Games searched by MCTS follow one turn-based protocol, implemented by
+# Checkers, Gomoku and Connect4 (and their bitboard variants):
+#
+#   player             id of the side to move (any int)
+#   legal_moves()      list of moves for the side to move
+#   push(move)         plays a move, pop() takes back the last pushed one
+#   clone()            independent copy of the current position
+#   terminal_value()   None while the game goes on, otherwise the outcome for
+#                      the player who made the last move: 1, 0 or -1
+#   hash               int identifying the position
+
+
+# Typecodes of the per-node arrays: visits, value sums (from the point of
+# view of the player who moved into the node), first child, number of
+# children, that player, the id of the move, the move's prior, the node
+# whose visits and value sum the node uses (itself unless it shares them
+# with a transposition) and the position hash (kept with a transposition
+# table). Visits and value sums are read through owners.
+NODE_ARRAYS = (('visits', 'i'), ('value_sums', 'f'), ('first_child', 'i'),
+               ('num_children', 'i'), ('movers', 'b'), ('move_ids', 'i'),
+               ('priors', 'f'), ('owners', 'i'), ('keys', 'Q'))
+
+
+class TranspositionTable:
+  # Fixed number of two-entry buckets mapping position hashes to the node
+  # holding their statistics. The first entry of a bucket keeps the most
+  # visited position, the second is always replaced. Nodes keep their
+  # statistics after eviction, they just stop being shared with new nodes.
+  def __init__(self, size=1 << 16):
+    self.num_buckets = max(1, size // 2)
+    self.hits = 0
+    self.misses = 0
+    self.clear()
+
+  def clear(self):
+    self.keys = [None] * (2 * self.num_buckets)
+    self.nodes = [0] * (2 * self.num_buckets)
+
+  def __len__(self):
+    return sum(key is not None for key in self.keys)
+
+  def lookup(self, key, node, visits):
+    # The node holding the statistics of key, node itself if key is new.
+    slot = 2 * (key % self.num_buckets)
+    for k in (slot, slot + 1):
+      if self.keys[k] == key:
+        self.hits += 1
+        return self.nodes[k]
+    self.misses += 1
+    if self.keys[slot + 1] is not None and (
+        self.keys[slot] is None or
+        visits[self.nodes[slot + 1]] > visits[self.nodes[slot]]):
+      self.keys[slot] = self.keys[slot + 1]
+      self.nodes[slot] = self.nodes[slot + 1]
+    self.keys[slot + 1] = key
+    self.nodes[slot + 1] = node
+    return node
+
+
+class MCTS:
+  # UCT with the tree stored in parallel arrays indexed by node id instead of
+  # one object per node. The children of a node are allocated as one
+  # contiguous block (first_child, num_children), so no sibling links are
+  # needed. Moves are interned: nodes store an int id into self.move_table.
+  # Positions are not stored: a playout pushes the moves from the root and
+  # pops them afterwards. Storage starts at capacity nodes and doubles when
+  # full, as long as it stays within max_memory bytes (None for no limit);
+  # past that the tree stops growing and playouts end in rollouts.
+  #
+  # puct=True selects with PUCT on the children's priors instead of UCT.
+  # With table_size set, children reaching the same position share visits
+  # and value sums through a TranspositionTable of that size. search(...,
+  # reuse=True) keeps the tree: find and reroot move the root to a position
+  # reached from it. select, backup and virtual_loss are the steps of a
+  # playout for callers that evaluate leaves elsewhere, in batches or in
+  # other processes.
+  def __init__(self, exploration=1.4, capacity=1 << 16, max_rollout_moves=500,
+               rng=None, max_memory=None, puct=False, table_size=None):
+    self.exploration = exploration
+    self.max_rollout_moves = max_rollout_moves
+    self.max_memory = max_memory
+    self.puct = puct
+    self.table = None if table_size is None else TranspositionTable(table_size)
+    self.rng = random.Random() if rng is None else rng
+    self.capacity = 0
+    for name, typecode in NODE_ARRAYS:
+      setattr(self, name, array.array(typecode))
+    self.resize(min(capacity, self.max_nodes()))
+    self.move_table = []
+    self.move_index = {}
+    self.clear()
+
+  def node_bytes(self):
+    return sum(getattr(self, name).itemsize for name, _ in NODE_ARRAYS)
+
+  def max_nodes(self):
+    if self.max_memory is None:
+      return math.inf
+    return self.max_memory // self.node_bytes()
+
+  def resize(self, capacity):
+    for name, typecode in NODE_ARRAYS:
+      getattr(self, name).extend(
+        array.array(typecode, [0]) * (capacity - self.capacity))
+    self.capacity = capacity
+
+  def grow(self):
+    # Doubles the storage, up to max_memory. Returns False if it is full.
+    capacity = min(2 * self.capacity, self.max_nodes())
+    if capacity <= self.capacity:
+      return False
+    self.resize(capacity)
+    return True
+
+  def memory_usage(self):
+    # Bytes held by the node arrays.
+    return self.capacity * self.node_bytes()
+
+  def move_id(self, move):
+    move_id = self.move_index.get(move)
+    if move_id is None:
+      move_id = self.move_index[move] = len(self.move_table)
+      self.move_table.append(move)
+    return move_id
+
+  def clear(self, game=None):
+    # Starts a new tree, for the position in game if a table is kept.
+    self.num_nodes = 1
+    self.visits[0] = 0
+    self.value_sums[0] = 0
+    self.num_children[0] = 0
+    self.movers[0] = -1
+    self.priors[0] = 1
+    self.owners[0] = 0
+    if self.table is not None:
+      self.table.clear()
+      if game is not None:
+        self.keys[0] = game.hash
+        self.table.lookup(game.hash, 0, self.visits)
+
+  def expanded(self, node):
+    return self.num_children[node] > 0
+
+  def expand(self, node, game, priors=None):
+    # priors, if given, are aligned with game.legal_moves(); uniform
+    # otherwise. Returns False when the game is over or the tree is full.
+    moves = game.legal_moves()
+    first = self.num_nodes
+    if not moves:
+      return False
+    while first + len(moves) > self.capacity:
+      if not self.grow():
+        return False
+    for k, move in enumerate(moves):
+      child = first + k
+      self.visits[child] = 0
+      self.value_sums[child] = 0
+      self.num_children[child] = 0
+      self.movers[child] = game.player
+      self.move_ids[child] = self.move_id(move)
+      self.priors[child] = 1 / len(moves) if priors is None else priors[k]
+      self.owners[child] = child
+      if self.table is not None:
+        game.push(move)
+        self.keys[child] = game.hash
+        game.pop()
+        self.owners[child] = self.table.lookup(self.keys[child], child,
+                                              self.visits)
+    self.first_child[node] = first
+    self.num_children[node] = len(moves)
+    self.num_nodes += len(moves)
+    return True
+
+  def move(self, node):
+    return self.move_table[self.move_ids[node]]
+
+  def children(self, node=0):
+    first = self.first_child[node]
+    return range(first, first + self.num_children[node])
+
+  def visit_count(self, node):
+    return self.visits[self.owners[node]]
+
+  def select_child(self, node):
+    visits, value_sums, owners = self.visits, self.value_sums, self.owners
+    first = self.first_child[node]
+    end = first + self.num_children[node]
+    n = visits[owners[node]]
+    if self.table is not None:
+      # Children shared with other paths may have been visited more often
+      # than this node, so the parent count is never taken below theirs.
+      n = max(n, sum(visits[owners[child]] for child in range(first, end)))
+    best, best_score = first, -math.inf
+    if self.puct:
+      c = self.exploration * math.sqrt(n)
+      for child in range(first, end):
+        s = owners[child]
+        q = value_sums[s] / visits[s] if visits[s] else 0
+        score = q + c * self.priors[child] / (1 + visits[s])
+        if score > best_score:
+          best, best_score = child, score
+      return best
+    log_n = math.log(n or 1)
+    for child in range(first, end):
+      s = owners[child]
+      if not visits[s]:
+        return child
+      score = (value_sums[s] / visits[s] +
+               self.exploration * math.sqrt(log_n / visits[s]))
+      if score > best_score:
+        best, best_score = child, score
+    return best
+
+  def rollout(self, game):
+    # Plays random moves to the end of the game and takes them back. Returns
+    # (player, value) with value for that player; games longer than
+    # max_rollout_moves count as draws.
+    depth = 0
+    player, value = None, 0
+    while depth < self.max_rollout_moves:
+      moves = game.legal_moves()
+      if not moves:
+        break
+      player = game.player
+      game.push(self.rng.choice(moves))
+      depth += 1
+      value = game.terminal_value()
+      if value is not None:
+        break
+    else:
+      value = 0
+    for _ in range(depth):
+      game.pop()
+    return player, value or 0
+
+  def select(self, game, expand=True):
+    # Descends from the root to a leaf, pushing the moves on game. With
+    # expand, a leaf visited before is expanded and one of its children
+    # becomes the leaf. Returns (path of node ids from the root, the leaf's
+    # terminal_value()).
+    path = [0]
+    node = 0
+    while self.expanded(node):
+      node = self.select_child(node)
+      game.push(self.move(node))
+      path.append(node)
+      value = game.terminal_value()
+      if value is not None:
+        return path, value
+    if expand and self.visit_count(node) and self.expand(node, game):
+      node = self.select_child(node)
+      game.push(self.move(node))
+      path.append(node)
+      return path, game.terminal_value()
+    return path, None
+
+  def unwind(self, game, path):
+    for _ in range(len(path) - 1):
+      game.pop()
+
+  def backup(self, path, player, value):
+    # value is for player; each node below the root is credited from the
+    # point of view of the player who moved into it.
+    visits, value_sums, owners = self.visits, self.value_sums, self.owners
+    visits[owners[0]] += 1
+    for node in path[1:]:
+      s = owners[node]
+      visits[s] += 1
+      value_sums[s] += value if self.movers[node] == player else -value
+
+  def virtual_loss(self, path, count=1):
+    # Counts a pending playout through path as a loss for the players making
+    # its moves, so that the selections made before it is backed up spread
+    # out; call with -count to revert.
+    for node in path:
+      s = self.owners[node]
+      self.visits[s] += count
+      if node:
+        self.value_sums[s] -= count
+
+  def playout(self, game):
+    path, value = self.select(game)
+    if value is not None:
+      player = self.movers[path[-1]]
+    else:
+      player, value = self.rollout(game)
+    self.backup(path, player, value)
+    self.unwind(game, path)
+
+  def find(self, game, key, player, node=0):
+    # Depth-first search below node, whose position is in game, for the node
+    # holding the position with the given hash, only descending while the
+    # opponent of player is to move. Returns None if there is none.
+    if game.player == player:
+      return node if game.hash == key else None
+    for child in self.children(node):
+      game.push(self.move(child))
+      found = self.find(game, key, player, child)
+      game.pop()
+      if found is not None:
+        return found
+    return None
+
+  def reroot(self, node):
+    # Makes node the root, dropping the rest of the tree. The subtree is
+    # copied to the front of the arrays, breadth first so that sibling
+    # blocks stay contiguous.
+    if node == 0:
+      return
+    order = [node]
+    new_ids = {node: 0}
+    for old in order:
+      for child in self.children(old):
+        new_ids[child] = len(order)
+        order.append(child)
+    # Statistics held by a dropped node move to the first kept node sharing
+    # them.
+    moved = {}
+    for old in order:
+      s = self.owners[old]
+      if s not in new_ids and s not in moved:
+        moved[s] = old
+    sources = {old: old for old in order}
+    for s, old in moved.items():
+      sources[old] = s
+    kept = [sources[old] for old in order]
+    for name in ('visits', 'value_sums'):
+      values = getattr(self, name)
+      values[:len(order)] = array.array(values.typecode,
+                                        [values[s] for s in kept])
+    for name in ('num_children', 'movers', 'move_ids', 'priors', 'keys'):
+      values = getattr(self, name)
+      values[:len(order)] = array.array(values.typecode,
+                                        [values[old] for old in order])
+    old_owners = [self.owners[old] for old in order]
+    self.owners[:len(order)] = array.array('i', [
+      new_ids[s] if s in new_ids else new_ids[moved[s]] for s in old_owners])
+    first_child = [self.first_child[old] for old in order]
+    self.first_child[:len(order)] = array.array('i', [
+      new_ids.get(first, 0) for first in first_child])
+    self.num_nodes = len(order)
+    if self.table is not None:
+      self.table.clear()
+      for k in range(self.num_nodes):
+        if self.owners[k] == k:
+          self.table.lookup(self.keys[k], k, self.visits)
+
+  def search(self, game, num_trials=None, time_limit=None, max_nodes=None,
+             reuse=False):
+    # Searches the position in game, which is restored on return, building a
+    # new tree unless reuse. Stops after num_trials playouts, time_limit
+    # seconds or max_nodes nodes added to the tree.
+    if not reuse:
+      self.clear(game)
+    if not self.expanded(0):
+      self.expand(0, game)
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit
+    start_nodes = self.num_nodes
+    playouts = 0
+    while ((num_trials is None or playouts < num_trials) and
+           (max_nodes is None or self.num_nodes - start_nodes < max_nodes) and
+           (deadline is None or time.perf_counter() < deadline)):
+      self.playout(game)
+      playouts += 1
+    seconds = time.perf_counter() - start
+    self.stats = {
+      'playouts': playouts,
+      'nodes': self.num_nodes,
+      'seconds': seconds,
+      'playouts_per_sec': playouts / seconds if seconds > 0 else 0,
+      'memory': self.memory_usage(),
+    }
+
+  def best_child(self):
+    return max(self.children(), key=self.visit_count)
+
+  def best_move(self):
+    return self.move(self.best_child())
+
+
+class EngineAgent:
+  # Works with both agent conventions in this repo: act(env) and
+  # act(observation, env).
+  def __init__(self, num_trials=1000, time_limit=None, exploration=1.4,
+               rng=None, max_memory=None):
+    self.num_trials = num_trials
+    self.time_limit = time_limit
+    self.engine = MCTS(exploration, rng=rng, max_memory=max_memory)
+
+  def act(self, observation, env=None):
+    game = (observation if env is None else env).clone()
+    self.engine.search(game, self.num_trials, self.time_limit)
+    self.stats = self.engine.stats
+    return self.engine.best_move()
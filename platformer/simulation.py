@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import random
+import sys
+import time
+
+from dataclasses import dataclass, field
+
+WIDTH = 800
+HEIGHT = 600
+D = 10
+
+def round_to_multiple(x, k):
+  return (int(x) // k) * k
+
+def segment_intersects(s1, s2):
+  return not ((s1[1] < s2[0]) or (s2[1] < s1[0]))
+
+@dataclass
+class Platform:
+  x: float
+  y: float
+  w: float
+  h: float
+
+  def intersects(self, other):
+    return (
+      segment_intersects((self.x, self.x + self.w),
+                         (other.x, other.x + other.w)) and
+      segment_intersects((self.y, self.y + self.h),
+                         (other.y, other.y + other.h)))
+
+
+@dataclass
+class Hero:
+  x: float = 0
+  y: float = 0
+  w: float = 3 * D
+  h: float = 3 * D
+  dx: float = 0
+  dy: float = 0
+  speed: float = D
+
+  jump_speed: float = 3 * D
+
+  fall_speed: float = D
+
+  on_platform: bool = False
+  hit_platform: bool = False
+  is_jumping: bool = False
+
+  # The jump slows down once per frame while it lasts (the pygame version
+  # used a 10 ms timer, which fired once per 60 FPS frame).
+  def jump(self, speed):
+    if not self.is_jumping:
+      self.is_jumping = True
+      self.dy = speed
+
+  def handle_jump(self):
+    if self.is_jumping:
+      if self.y <= 0 or (self.on_platform and self.dy <= 0):
+        self.is_jumping = False
+        self.dy = 0
+      else:
+        self.dy = max(self.dy - self.jump_speed / 10, -self.fall_speed)
+
+  def intersects_x(self, p):
+    return segment_intersects(
+      (self.x + 1, self.x + self.w - 1), (p.x, p.x + p.w))
+
+  def intersects_y(self, p):
+    return segment_intersects(
+      (self.y + 1, self.y + self.h - 1), (p.y, p.y + p.h))
+
+  def intersect(self, platforms):
+    self.on_platform = False
+    for p in platforms:
+      if self.intersects_y(p):
+        if self.x + self.w > p.x and self.x + self.w <= p.x + D:
+          self.dx = 0
+          self.x = p.x - self.w
+        elif self.x < p.x + p.w and self.x >= p.x + p.w - D:
+          self.dx = 0
+          self.x = p.x + p.w
+      if self.intersects_x(p):
+        if (self.y >= p.y + p.h and
+            self.y + self.dy <= p.y + p.h):
+          self.y = p.y + p.h
+          self.on_platform = True
+          self.is_jumping = False
+          self.dy = 0
+        if (self.y + self.h <= p.y and
+            self.y + self.h + self.dy >= p.y):
+          self.y = p.y - self.h
+          self.dy = 0
+
+    if not (self.on_platform or self.is_jumping):
+      self.dy = -self.fall_speed
+
+  def move(self):
+    self.x += self.dx
+    self.y += self.dy
+    self.x = round_to_multiple(self.x, D)
+    self.y = round_to_multiple(self.y, D)
+    self.y = max(self.y, 0)
+    self.y = min(self.y, HEIGHT - self.h)
+    self.x = max(self.x, 0)
+    self.x = min(self.x, WIDTH - self.w)
+
+
+def default_platforms():
+  return [Platform(100, 30, 300, 20), Platform(500, 150, 200, 20)]
+
+
+@dataclass
+class Platformer:
+  # The game without any pygame, y pointing up. step advances one frame given
+  # the input: dx in -1, 0, 1 and whether to jump. Like a key press, a
+  # change of dx sets the hero's speed, which bumping into a platform side
+  # resets to 0 until the next change.
+  hero: Hero = field(default_factory=Hero)
+  platforms: list = field(default_factory=default_platforms)
+  held_dx: int = 0
+  frame: int = 0
+
+  def step(self, dx=0, jump=False):
+    hero = self.hero
+    hero.intersect(self.platforms)
+    hero.move()
+    if dx != self.held_dx:
+      hero.dx = dx * hero.speed
+      self.held_dx = dx
+    if hero.is_jumping:
+      hero.handle_jump()
+    if jump:
+      hero.jump(hero.jump_speed)
+    self.frame += 1
+
+
+def main():
+  # Headless run with random inputs; reports frames/sec.
+  num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  game = Platformer()
+  rng = random.Random(0)
+  inputs = (0, False)
+  landings = 0
+  start = time.perf_counter()
+  for frame in range(num_frames):
+    if frame % 15 == 0:
+      inputs = (rng.choice((-1, 0, 1)), rng.random() < 0.3)
+    on_platform = game.hero.on_platform
+    game.step(*inputs)
+    landings += game.hero.on_platform and not on_platform
+  seconds = time.perf_counter() - start
+  print('%d frames, %d landings on platforms, %.0f frames/sec' % (
+    num_frames, landings, num_frames / seconds))
+
+
+if __name__ == '__main__':
+  main()
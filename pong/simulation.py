@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+import json
+import os
+import random
+import sys
+import time
+
+WIDTH = 800
+HEIGHT = 600
+PADDLE_WIDTH = 20
+PADDLE_HEIGHT = 100
+PADDLE_SPEED = 8
+
+BALL_RADIUS = 20
+
+
+class Paddle:
+  def __init__(self, x, y):
+    self.x = x
+    self.y = y
+    self.dy = 0
+
+  def move(self):
+    self.y += self.dy
+    self.y = max(self.y, 0)
+    self.y = min(self.y, HEIGHT - PADDLE_HEIGHT)
+
+  def touches(self, ball):
+    for d in (-1, 1):
+      x = ball.x + d * BALL_RADIUS
+      y = ball.y
+      if (x >= self.x and x <= (self.x + PADDLE_WIDTH) and
+          y >= self.y and y <= (self.y + PADDLE_HEIGHT)):
+        return True
+    return False
+
+
+class Ball:
+  def __init__(self, x, y, rng=random):
+    self.x = x
+    self.y = y
+    self.dx = rng.randrange(5, 10)
+    self.dy = rng.randrange(3, 6)
+
+  def move(self):
+    self.x += int(self.dx)
+    self.y += int(self.dy)
+
+  def reflect_updown(self):
+    self.dy = -self.dy
+
+  def reflect_paddle(self):
+    self.dx = -self.dx
+
+
+class Pong:
+  # The game without any pygame: step advances one frame given the paddle
+  # inputs, -1 (up), 0 or 1 (down) for the right paddle p1 and the left
+  # paddle p2. It returns 1 or 2 when that player's paddle misses the ball,
+  # which then starts again from the centre, otherwise 0.
+  def __init__(self, seed=None):
+    self.rng = random.Random(seed)
+    self.reset()
+
+  def reset(self):
+    self.p1 = Paddle(WIDTH - PADDLE_WIDTH, HEIGHT // 2)
+    self.p2 = Paddle(0, HEIGHT // 2)
+    self.ball = Ball(WIDTH // 2, HEIGHT // 2, self.rng)
+    self.frame = 0
+
+  def step(self, dy1=0, dy2=0):
+    p1, p2, ball = self.p1, self.p2, self.ball
+    p1.dy = dy1 * PADDLE_SPEED
+    p2.dy = dy2 * PADDLE_SPEED
+    missed = 0
+
+    if ball.y <= BALL_RADIUS or ball.y >= HEIGHT - BALL_RADIUS:
+      ball.reflect_updown()
+
+    if p1.touches(ball) or p2.touches(ball):
+      ball.reflect_paddle()
+      ball.dx = 1.1 * ball.dx
+      ball.dy = 1.1 * ball.dy
+    elif ball.x <= BALL_RADIUS or ball.x >= WIDTH - BALL_RADIUS:
+      missed = 1 if ball.x >= WIDTH - BALL_RADIUS else 2
+      ball = self.ball = Ball(WIDTH // 2, HEIGHT // 2, self.rng)
+
+    p1.move()
+    p2.move()
+    ball.move()
+    self.frame += 1
+    return missed
+
+
+def follow(paddle, ball):
+  # Input that moves the paddle towards the ball.
+  centre = paddle.y + PADDLE_HEIGHT // 2
+  return (ball.y > centre) - (ball.y < centre)
+
+
+# A replay log is a JSON object: the game's seed, the inputs of every frame
+# and the state the game ends in. Replaying a log steps a new game with the
+# same seed through the same inputs, so only the speed of step is measured.
+def state(game):
+  return [game.frame, game.p1.y, game.p2.y, game.ball.x, game.ball.y,
+          game.ball.dx, game.ball.dy]
+
+
+def replay(log):
+  # Raises AssertionError if the game does not end in the recorded state.
+  game = Pong(log['seed'])
+  for inputs in log['inputs']:
+    game.step(*inputs)
+  if state(game) != log['state']:
+    raise AssertionError('replay ends in %s, expected %s' % (state(game),
+                                                             log['state']))
+  return game
+
+
+def main():
+  # python simulation.py [num_frames] [log]: headless run with both paddles
+  # following the ball; reports frames/sec. The run is written to log as a
+  # replay log, or, if log exists, the log is replayed instead.
+  num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  path = sys.argv[2] if len(sys.argv) > 2 else None
+  if path is not None and os.path.exists(path):
+    with open(path) as f:
+      log = json.load(f)
+    start = time.perf_counter()
+    replay(log)
+    seconds = time.perf_counter() - start
+    print('%d frames replayed, %.0f frames/sec' % (
+      len(log['inputs']), len(log['inputs']) / seconds))
+    return
+  game = Pong(seed=0)
+  inputs = [] if path is not None else None
+  misses = [0, 0, 0]
+  start = time.perf_counter()
+  for _ in range(num_frames):
+    dy = follow(game.p1, game.ball), follow(game.p2, game.ball)
+    if inputs is not None:
+      inputs.append(dy)
+    misses[game.step(*dy)] += 1
+  seconds = time.perf_counter() - start
+  print('%d frames, misses %d / %d, %.0f frames/sec' % (
+    num_frames, misses[1], misses[2], num_frames / seconds))
+  if path is not None:
+    with open(path, 'w') as f:
+      json.dump({'seed': 0, 'inputs': inputs, 'state': state(game)}, f)
+
+
+if __name__ == '__main__':
+  main()
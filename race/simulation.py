@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import json
+import os
+import random
+import sys
+import time
+
+WIDTH = 600
+HEIGHT = 800
+
+CAR_WIDTH = 40
+CAR_HEIGHT = 40
+CAR_SPEED = 8
+
+MIN_PIECE_WIDTH = 40
+MAX_PIECE_WIDTH = 100
+PIECE_HIEGHT = 40
+PIECE_SPEED = 4
+PIECE_RATE= 20
+
+
+class Piece:
+  def __init__(self, x, y, w, h, speed, allow_out):
+    self.x = x
+    self.y = y
+    self.w = w
+    self.h = h
+    self.speed = speed
+    self.allow_out = allow_out
+    self.dx = 0
+    self.dy = 0
+
+  def move(self):
+    self.x += self.speed * self.dx
+    self.x = max(self.x, 0)
+    self.x = min(self.x, WIDTH - self.w)
+
+    self.y += self.speed * self.dy
+    self.y = max(self.y, 0)
+    self.y = min(self.y, HEIGHT - (not self.allow_out) * self.h)
+
+  def contains(self, x, y):
+    return (x >= self.x and x <= (self.x + self.w) and
+            y >= self.y and y <= self.y + self.h)
+
+  def intersects(self, other):
+    return (
+      other.contains(self.x, self.y) or
+      other.contains(self.x + self.w, self.y) or
+      other.contains(self.x, self.y + self.h) or
+      other.contains(self.x + self.w, self.y + self.h) or
+      self.contains(other.x, other.y) or
+      self.contains(other.x + other.w, other.y) or
+      self.contains(other.x, other.y + other.h) or
+      self.contains(other.x + other.w, other.y + other.h)
+    )
+
+  @classmethod
+  def generate(cls, rng=random):
+    x = rng.randrange(0, WIDTH - MIN_PIECE_WIDTH)
+    w = min(rng.randrange(MIN_PIECE_WIDTH, WIDTH - x), MAX_PIECE_WIDTH)
+    p = Piece(x, 0, w, PIECE_HIEGHT, PIECE_SPEED, True)
+    p.dy = 1
+    return p
+
+  def is_out(self):
+    return self.y >= HEIGHT
+
+def init_car():
+  return Piece(
+    x=(WIDTH - CAR_WIDTH) // 2, y=HEIGHT - CAR_HEIGHT,
+    w=CAR_WIDTH, h=CAR_HEIGHT, speed=CAR_SPEED, allow_out=False)
+
+
+class Race:
+  # The game without any pygame: step advances one frame given the car
+  # input, dx and dy in -1, 0, 1. It returns True when the car crashes, which
+  # clears the road and puts the car back at the start.
+  def __init__(self, seed=None):
+    self.rng = random.Random(seed)
+    self.reset()
+
+  def reset(self):
+    self.car = init_car()
+    self.pieces = []
+    self.frame = 0
+    self.crashes = 0
+
+  def step(self, dx=0, dy=0):
+    car = self.car
+    car.dx, car.dy = dx, dy
+    if self.frame % PIECE_RATE == 0:
+      self.pieces.append(Piece.generate(self.rng))
+    self.frame += 1
+
+    car.move()
+    survived = []
+    for p in self.pieces:
+      p.move()
+      # Pieces still wholly above the car cannot touch it.
+      if p.y + p.h >= car.y and car.intersects(p):
+        self.pieces = []
+        self.car = init_car()
+        self.crashes += 1
+        return True
+      if not p.is_out():
+        survived.append(p)
+    self.pieces = survived
+    return False
+
+
+def dodge(game):
+  # Input that steers the car away from the nearest piece above it.
+  car = game.car
+  above = [p for p in game.pieces if p.y + p.h <= car.y + car.h and
+           p.x < car.x + car.w + CAR_SPEED and p.x + p.w > car.x - CAR_SPEED]
+  if not above:
+    return 0, 0
+  nearest = max(above, key=lambda p: p.y)
+  return (-1 if 2 * car.x + car.w < 2 * nearest.x + nearest.w else 1), 0
+
+
+# A replay log is a JSON object: the game's seed, the inputs of every frame
+# and the state the game ends in. Replaying a log steps a new game with the
+# same seed through the same inputs, so only the speed of step is measured.
+def state(game):
+  return [game.frame, game.crashes, game.car.x, game.car.y,
+          [[p.x, p.y, p.w] for p in game.pieces]]
+
+
+def replay(log):
+  # Raises AssertionError if the game does not end in the recorded state.
+  game = Race(log['seed'])
+  for inputs in log['inputs']:
+    game.step(*inputs)
+  if state(game) != log['state']:
+    raise AssertionError('replay ends in %s, expected %s' % (state(game),
+                                                             log['state']))
+  return game
+
+
+def main():
+  # python simulation.py [num_frames] [log]: headless run with a car dodging
+  # to the nearest side; reports frames/sec. The run is written to log as a
+  # replay log, or, if log exists, the log is replayed instead.
+  num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  path = sys.argv[2] if len(sys.argv) > 2 else None
+  if path is not None and os.path.exists(path):
+    with open(path) as f:
+      log = json.load(f)
+    start = time.perf_counter()
+    replay(log)
+    seconds = time.perf_counter() - start
+    print('%d frames replayed, %.0f frames/sec' % (
+      len(log['inputs']), len(log['inputs']) / seconds))
+    return
+  game = Race(seed=0)
+  inputs = [] if path is not None else None
+  start = time.perf_counter()
+  for _ in range(num_frames):
+    dxy = dodge(game)
+    if inputs is not None:
+      inputs.append(dxy)
+    game.step(*dxy)
+  seconds = time.perf_counter() - start
+  print('%d frames, %d crashes, %.0f frames/sec' % (
+    num_frames, game.crashes, num_frames / seconds))
+  if path is not None:
+    with open(path, 'w') as f:
+      json.dump({'seed': 0, 'inputs': inputs, 'state': state(game)}, f)
+
+
+if __name__ == '__main__':
+  main()
@@ -1,68 +1,57 @@
 #!/usr/bin/env python
 
 import pygame
-import random
+import sys
 
-def random_not_in_snake(w, h, snake):
-  empty_cells = []
-  for i in range(w):
-    for j in range(h):
-      if (i, j) not in snake:
-        empty_cells.append((i, j))
-  return random.choice(empty_cells)
+from simulation import WIDTH, HEIGHT, CELL_SIZE, UP, DOWN, LEFT, RIGHT, \
+    Snake
 
-def main():  
-  width = 800
-  height = 600
-  fps = 10
-  cell_size = 40
-  w = width // cell_size
-  h = height // cell_size
-  color = (0, 128, 255)
-  dx = [0, 0, -1, 1]
-  dy = [-1, 1, 0, 0]
+FPS = 10
 
-  def draw_cell(x, y, is_empty=False):
-    c = (0, 0, 0) if is_empty else color
-    pygame.draw.rect(
-      screen, c, pygame.Rect(x * cell_size, y * cell_size, cell_size, cell_size))
+COLOR = (0, 128, 255)
 
+KEYS = {
+  pygame.K_UP: UP,
+  pygame.K_DOWN: DOWN,
+  pygame.K_LEFT: LEFT,
+  pygame.K_RIGHT: RIGHT,
+}
+
+
+def draw_cell(screen, x, y):
+  pygame.draw.rect(
+    screen, COLOR, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE,
+                               CELL_SIZE))
+
+
+def draw(screen, game):
+  screen.fill((0, 0, 0))
+  draw_cell(screen, *game.food)
+  for cell in game.snake:
+    draw_cell(screen, *cell)
+
+
+def main():
+  # python main.py [seed]: the same seed gives the same random sequence.
+  game = Snake(int(sys.argv[1]) if len(sys.argv) > 1 else None)
   pygame.init()
-  screen = pygame.display.set_mode((width, height))
+  screen = pygame.display.set_mode((WIDTH, HEIGHT))
   done = False
   clock = pygame.time.Clock()
 
-  snake = [random_not_in_snake(w, h, [])]
-  food = random_not_in_snake(w, h, snake)
-  direction = 0
-
   while not done:
     for event in pygame.event.get():
       if event.type == pygame.QUIT:
         done = True
-      elif event.type == pygame.KEYDOWN:
-        if event.key == pygame.K_UP and direction != 1: direction = 0
-        if event.key == pygame.K_DOWN and direction != 0: direction = 1
-        if event.key == pygame.K_LEFT and direction != 3: direction = 2
-        if event.key == pygame.K_RIGHT and direction != 2: direction = 3
-
-    draw_cell(*food)
-
-    head = ((snake[0][0] + dx[direction]) % w, (snake[0][1] + dy[direction]) % h)
-    draw_cell(*head)
+      elif event.type == pygame.KEYDOWN and event.key in KEYS:
+        game.turn(KEYS[event.key])
 
-    if head in snake:
+    # The game ends when the snake bites itself.
+    if game.step():
       done = True
-    if head == food:
-      snake = [head] + snake
-      food = random_not_in_snake(w, h, snake)
-    else:
-      draw_cell(*snake[-1], is_empty=True)
-      snake = [head] + snake[:-1]
-
-
+    draw(screen, game)
     pygame.display.flip()
-    clock.tick(fps)
+    clock.tick(FPS)
 
 
 if __name__ == '__main__':
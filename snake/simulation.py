@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import json
+import os
+import random
+import sys
+import time
+
+WIDTH = 800
+HEIGHT = 600
+CELL_SIZE = 40
+
+UP = 0
+DOWN = 1
+LEFT = 2
+RIGHT = 3
+
+DX = [0, 0, -1, 1]
+DY = [-1, 1, 0, 0]
+
+
+def random_not_in_snake(w, h, snake, rng=random):
+  empty_cells = []
+  for i in range(w):
+    for j in range(h):
+      if (i, j) not in snake:
+        empty_cells.append((i, j))
+  return rng.choice(empty_cells)
+
+
+class Snake:
+  # The game without any pygame: step advances one frame, first turning to
+  # direction if one is given. Turning straight back is ignored, as are the
+  # arrow keys in main.py. step returns True when the snake bites itself,
+  # which starts a new game.
+  def __init__(self, seed=None, w=WIDTH // CELL_SIZE, h=HEIGHT // CELL_SIZE):
+    self.rng = random.Random(seed)
+    self.w = w
+    self.h = h
+    self.reset()
+
+  def reset(self):
+    self.snake = [random_not_in_snake(self.w, self.h, [], self.rng)]
+    self.food = random_not_in_snake(self.w, self.h, self.snake, self.rng)
+    self.direction = UP
+    self.frame = 0
+
+  def turn(self, direction):
+    # UP and DOWN, LEFT and RIGHT are opposite.
+    if direction != self.direction ^ 1:
+      self.direction = direction
+
+  def step(self, direction=None):
+    if direction is not None:
+      self.turn(direction)
+    self.frame += 1
+    snake = self.snake
+    head = ((snake[0][0] + DX[self.direction]) % self.w,
+            (snake[0][1] + DY[self.direction]) % self.h)
+    if head in snake:
+      self.reset()
+      return True
+    if head == self.food:
+      self.snake = [head] + snake
+      self.food = random_not_in_snake(self.w, self.h, self.snake, self.rng)
+    else:
+      self.snake = [head] + snake[:-1]
+    return False
+
+
+def seek(game):
+  # Input that heads for the food, avoiding the snake's own cells when it
+  # can.
+  x, y = game.snake[0]
+  best, best_distance = None, None
+  for direction in (UP, DOWN, LEFT, RIGHT):
+    if direction == game.direction ^ 1:
+      continue
+    head = (x + DX[direction]) % game.w, (y + DY[direction]) % game.h
+    dx = abs(head[0] - game.food[0])
+    dy = abs(head[1] - game.food[1])
+    distance = (head in game.snake,
+                min(dx, game.w - dx) + min(dy, game.h - dy))
+    if best_distance is None or distance < best_distance:
+      best, best_distance = direction, distance
+  return best
+
+
+# A replay log is a JSON object: the game's seed, the input of every frame
+# and the state the game ends in. Replaying a log steps a new game with the
+# same seed through the same inputs, so only the speed of step is measured.
+def state(game):
+  return [game.frame, game.direction, [list(cell) for cell in game.snake],
+          list(game.food)]
+
+
+def replay(log):
+  # Raises AssertionError if the game does not end in the recorded state.
+  game = Snake(log['seed'])
+  for direction in log['inputs']:
+    game.step(direction)
+  if state(game) != log['state']:
+    raise AssertionError('replay ends in %s, expected %s' % (state(game),
+                                                             log['state']))
+  return game
+
+
+def main():
+  # python simulation.py [num_frames] [log]: headless run with a snake
+  # heading for the food; reports frames/sec. The run is written to log as a
+  # replay log, or, if log exists, the log is replayed instead.
+  num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  path = sys.argv[2] if len(sys.argv) > 2 else None
+  if path is not None and os.path.exists(path):
+    with open(path) as f:
+      log = json.load(f)
+    start = time.perf_counter()
+    replay(log)
+    seconds = time.perf_counter() - start
+    print('%d frames replayed, %.0f frames/sec' % (
+      len(log['inputs']), len(log['inputs']) / seconds))
+    return
+  game = Snake(seed=0)
+  inputs = [] if path is not None else None
+  bites = 0
+  start = time.perf_counter()
+  for _ in range(num_frames):
+    direction = seek(game)
+    if inputs is not None:
+      inputs.append(direction)
+    bites += game.step(direction)
+  seconds = time.perf_counter() - start
+  print('%d frames, %d games over, %.0f frames/sec' % (
+    num_frames, bites, num_frames / seconds))
+  if path is not None:
+    with open(path, 'w') as f:
+      json.dump({'seed': 0, 'inputs': inputs, 'state': state(game)}, f)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+import json
+import os
+import random
+import sys
+import time
+
+WIDTH = 800
+HEIGHT = 600
+
+TANK_WIDTH = 40
+TANK_HEIGHT = 40
+TANK_SPEED = 8
+
+ENEMY_SPEED = 4
+
+UP = 0
+RIGHT = 1
+DOWN = 2
+LEFT = 3
+
+DIRECTIONS = [UP, RIGHT, DOWN, LEFT]
+DX = [0, 1, 0, -1]
+DY = [-1, 0, 1, 0]
+
+BULLET_SHIFT = [(2, 0), (4, 2), (2, 4), (0, 2)]
+
+BULLET_RADIUS = 5
+BULLET_SPEED = 10
+
+
+class Bullet:
+  def __init__(self, x, y, direction,
+               r=BULLET_RADIUS,
+               speed=BULLET_SPEED):
+    self.x = x
+    self.y = y
+    self.dx = DX[direction]
+    self.dy = DY[direction]
+    self.r = r
+    self.speed = speed
+
+  def move(self):
+    self.x += self.speed * self.dx
+    self.y += self.speed * self.dy
+
+  def is_out(self):
+    return self.x <= 0 or self.x >= WIDTH or self.y <= 0 or self.y >= HEIGHT
+
+
+class Tank:
+  def __init__(self, x, y, direction,
+               w=TANK_WIDTH,
+               h=TANK_HEIGHT,
+               speed=TANK_SPEED):
+    self.x = x
+    self.y = y
+    self.w = w
+    self.h = h
+    self.speed = speed
+    self.direction = direction
+    self.dx = 0
+    self.dy = 0
+
+  def move(self):
+    self.x += self.speed * self.dx
+    self.x = max(self.x, 0)
+    self.x = min(self.x, WIDTH - self.w)
+
+    self.y += self.speed * self.dy
+    self.y = max(self.y, 0)
+    self.y = min(self.y, HEIGHT - self.h)
+
+  def contains(self, x, y):
+    return (x > self.x and x < (self.x + self.w) and
+            y > self.y and y < self.y + self.h)
+
+  def intersects(self, other):
+    return (
+      other.contains(self.x, self.y) or
+      other.contains(self.x + self.w, self.y) or
+      other.contains(self.x, self.y + self.h) or
+      other.contains(self.x + self.w, self.y + self.h) or
+      self.contains(other.x, other.y) or
+      self.contains(other.x + other.w, other.y) or
+      self.contains(other.x, other.y + other.h) or
+      self.contains(other.x + other.w, other.y + other.h)
+    )
+
+  def hit_by(self, bullet):
+    return self.contains(bullet.x, bullet.y)
+
+  def shoot(self):
+    return Bullet(
+      self.x + self.w * BULLET_SHIFT[self.direction][0] // 4,
+      self.y + self.h * BULLET_SHIFT[self.direction][1] // 4,
+      self.direction)
+
+
+class EnemyTank(Tank):
+
+  def __init__(self, x, y, leg_range,
+               w=TANK_WIDTH, h=TANK_HEIGHT,
+               speed=ENEMY_SPEED, rng=random):
+    super(EnemyTank, self).__init__(x, y, UP, w, h, speed)
+    self.rng = rng
+    self.leg_range = leg_range
+    self.leg_i = 0
+    self.shoot_i = 0
+
+
+  def move(self):
+    if self.leg_i == 0:
+      self.leg = self.rng.randrange(*self.leg_range)
+      self.direction = self.rng.randrange(0, 4)
+      self.dx = DX[self.direction]
+      self.dy = DY[self.direction]
+    self.leg_i = (self.leg_i + 1) % self.leg
+    super(EnemyTank, self).move()
+
+  def maybe_shoot(self, tank):
+    # Check shoot line intersects tank(+neighborhod) rectangle
+    pass
+
+
+def init_tank():
+  return Tank(
+    x=(WIDTH - TANK_WIDTH) // 2, y=HEIGHT - TANK_HEIGHT,
+    direction=UP)
+
+def init_enemies(rng=random):
+  return [
+    EnemyTank(100, 100, (20, 30), rng=rng),
+    EnemyTank(300, 200, (20, 30), rng=rng),
+    EnemyTank(400, 300, (20, 30), rng=rng),
+    EnemyTank(500, 400, (20, 30), rng=rng),
+  ]
+
+
+class Tanks:
+  # The game without any pygame: step advances one frame given the player's
+  # input, dx and dy in -1, 0, 1 and whether to shoot. The tank turns towards
+  # an axis when its input along that axis is newly pressed, like a key
+  # press. step returns True when the tank is hit, which restarts the game.
+  def __init__(self, seed=None):
+    self.rng = random.Random(seed)
+    self.reset()
+
+  def reset(self):
+    self.tank = init_tank()
+    self.enemies = init_enemies(self.rng)
+    self.bullets = []
+    self.frame = 0
+
+  def step(self, dx=0, dy=0, shoot=False):
+    tank = self.tank
+    if dy and dy != tank.dy:
+      tank.direction = UP if dy < 0 else DOWN
+    if dx and dx != tank.dx:
+      tank.direction = LEFT if dx < 0 else RIGHT
+    tank.dx, tank.dy = dx, dy
+    if shoot:
+      self.bullets.append(tank.shoot())
+    self.frame += 1
+
+    dead_bullets = set([])
+    dead_enemies = set([])
+    for i, bullet in enumerate(self.bullets):
+      if bullet.is_out():
+        dead_bullets.add(i)
+        continue
+      if tank.hit_by(bullet):
+        self.reset()
+        return True
+      for j, enemy in enumerate(self.enemies):
+        if enemy.hit_by(bullet):
+          dead_bullets.add(i)
+          dead_enemies.add(j)
+
+    self.bullets = [b for (i, b) in enumerate(self.bullets)
+                    if i not in dead_bullets]
+    self.enemies = [e for (i, e) in enumerate(self.enemies)
+                    if i not in dead_enemies]
+
+    for f in [tank] + self.enemies + self.bullets:
+      f.move()
+
+    for e in self.enemies:
+      b = e.maybe_shoot(tank)
+      if b is not None:
+        self.bullets.append(b)
+    return False
+
+
+# A replay log is a JSON object: the game's seed, the inputs of every frame
+# and the state the game ends in. Replaying a log steps a new game with the
+# same seed through the same inputs, restarting it when all enemies are gone
+# as main does, so only the speed of step is measured.
+def state(game):
+  return [game.frame, game.tank.x, game.tank.y, game.tank.direction,
+          [[e.x, e.y, e.direction] for e in game.enemies],
+          [[b.x, b.y] for b in game.bullets]]
+
+
+def replay(log):
+  # Raises AssertionError if the game does not end in the recorded state.
+  game = Tanks(log['seed'])
+  for inputs in log['inputs']:
+    game.step(*inputs)
+    if not game.enemies:
+      game.reset()
+  if state(game) != log['state']:
+    raise AssertionError('replay ends in %s, expected %s' % (state(game),
+                                                             log['state']))
+  return game
+
+
+def main():
+  # python simulation.py [num_frames] [log]: headless run with random
+  # inputs, restarting when all enemies are gone; reports frames/sec. The run
+  # is written to log as a replay log, or, if log exists, the log is replayed
+  # instead.
+  num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  path = sys.argv[2] if len(sys.argv) > 2 else None
+  if path is not None and os.path.exists(path):
+    with open(path) as f:
+      log = json.load(f)
+    start = time.perf_counter()
+    replay(log)
+    seconds = time.perf_counter() - start
+    print('%d frames replayed, %.0f frames/sec' % (
+      len(log['inputs']), len(log['inputs']) / seconds))
+    return
+  game = Tanks(seed=0)
+  rng = random.Random(1)
+  inputs = (0, 0, False)
+  log_inputs = [] if path is not None else None
+  kills = 0
+  start = time.perf_counter()
+  for frame in range(num_frames):
+    if frame % 10 == 0:
+      inputs = (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)),
+                rng.random() < 0.3)
+    if log_inputs is not None:
+      log_inputs.append(inputs)
+    enemies = len(game.enemies)
+    game.step(*inputs)
+    kills += enemies - len(game.enemies)
+    if not game.enemies:
+      game.reset()
+  seconds = time.perf_counter() - start
+  print('%d frames, %d enemies hit, %.0f frames/sec' % (
+    num_frames, kills, num_frames / seconds))
+  if path is not None:
+    with open(path, 'w') as f:
+      json.dump({'seed': 0, 'inputs': log_inputs, 'state': state(game)}, f)
+
+
+if __name__ == '__main__':
+  main()
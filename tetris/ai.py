@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from simulation import ROTATIONS, Board, GeneratePiece
+
+
+# Weights of aggregate height, lines cleared, holes and bumpiness.
+DEFAULT_WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+
+def _footprints(shape):
+  # Distinct rotations of a shape (turns, rotation) and, for each column
+  # offset of its 5x5 grid that has cells, the lowest occupied row.
+  footprints, seen = [], set()
+  for turns, rotation in enumerate(ROTATIONS[shape]):
+    xs = [x for x, y in rotation.cells]
+    ys = [y for x, y in rotation.cells]
+    # Rotations equal up to a translation land the same way.
+    key = frozenset((x - min(xs), y - min(ys)) for x, y in rotation.cells)
+    if key in seen:
+      continue
+    seen.add(key)
+    bottoms = {}
+    for x, y in rotation.cells:
+      bottoms[x] = max(bottoms.get(x, -1), y)
+    footprints.append((turns, rotation, tuple(bottoms.items())))
+  return footprints
+
+
+FOOTPRINTS = [_footprints(shape) for shape in range(len(ROTATIONS))]
+
+
+def placements(board, piece):
+  # Every (turns, x, y) where the piece comes to rest after turning at its
+  # current position, sliding sideways and dropping straight down.
+  v = board.v
+  tops = (v != 0).argmax(axis=0)
+  result = []
+  for turns, rotation, bottoms in FOOTPRINTS[piece.shape]:
+    turns = (turns - piece.rotation) % 4
+    if not board.fits(piece, turns=turns):
+      continue
+    lo = hi = 0
+    while board.fits(piece, dx=lo - 1, turns=turns):
+      lo -= 1
+    while board.fits(piece, dx=hi + 1, turns=turns):
+      hi += 1
+    for dx in range(lo, hi + 1):
+      x = piece.x + dx
+      y = int(min(tops[x + cx] - cy for cx, cy in bottoms)) - 1
+      if y >= piece.y:
+        result.append((turns, x, y))
+  return result
+
+
+def place(board, piece, placement):
+  # Plays a placement with the piece's moves, locks the piece and returns
+  # the number of lines cleared. Raises ValueError, leaving the board as it
+  # was, if the piece cannot reach the placement.
+  turns, x, y = placement
+  if not board.fits(piece, turns=turns):
+    raise ValueError('placement %s: piece cannot turn' % (placement,))
+  piece.rotate(turns)
+  step = 1 if x > piece.x else -1
+  while piece.x != x:
+    if not board.fits(piece, dx=step):
+      raise ValueError('placement %s: blocked at x = %d' % (placement,
+                                                             piece.x))
+    piece.shift(step, 0)
+  while board.fits(piece, dy=1):
+    piece.shift(0, 1)
+  if piece.y != y:
+    raise ValueError('placement %s: piece lands at y = %d' % (placement,
+                                                               piece.y))
+  board.add(piece)
+  return board.burn()
+
+
+class Evaluator:
+  # Scores boards as a weighted sum of aggregate column height, lines
+  # cleared, holes (empty cells below a column's top) and bumpiness (sum of
+  # height differences of neighbouring columns). All placements of a piece
+  # are scored together on a (P, rows, columns) stack.
+  def __init__(self, weights=DEFAULT_WEIGHTS):
+    self.weights = np.array(weights)
+
+  def features(self, field, piece, candidates):
+    rows, cols = field.shape
+    stack = np.repeat(field[None] != 0, len(candidates), axis=0)
+    k, ys, xs = [], [], []
+    for n, (turns, x, y) in enumerate(candidates):
+      for cx, cy in piece.mask(turns).cells:
+        k.append(n)
+        ys.append(y + cy)
+        xs.append(x + cx)
+    stack[k, ys, xs] = True
+    full = stack.all(axis=2)
+    lines = full.sum(axis=1)
+    cleared = np.flatnonzero(lines)
+    if len(cleared):
+      # Clear lines as Board.burn does: a stable sort moves the full rows to
+      # the top, where they are emptied.
+      order = np.argsort(~full[cleared], axis=1, kind='stable')
+      compacted = np.take_along_axis(stack[cleared], order[:, :, None], axis=1)
+      compacted[np.arange(rows) < lines[cleared, None]] = False
+      stack[cleared] = compacted
+    filled = stack.any(axis=1)
+    heights = np.where(filled, rows - stack.argmax(axis=1), 0)
+    holes = heights.sum(axis=1) - stack.sum(axis=(1, 2))
+    aggregate = heights.sum(axis=1)
+    bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    return np.stack([aggregate, lines, holes, bumpiness], axis=1)
+
+  def scores(self, board, piece, candidates):
+    shifted = [(turns, x - board.pad, y) for turns, x, y in candidates]
+    return self.features(board.field(), piece, shifted) @ self.weights
+
+
+class TetrisAgent:
+  # Picks the placement of the current piece with the best evaluation. With
+  # lookahead, each placement is played out and scored by the best placement
+  # of the next piece on the resulting board instead.
+  def __init__(self, evaluator=None, lookahead=False):
+    self.evaluator = Evaluator() if evaluator is None else evaluator
+    self.lookahead = lookahead
+    self.stats = {'placements': 0, 'seconds': 0}
+
+  def act(self, board, piece, next_piece=None):
+    # Returns a placement for place(), or None if the piece cannot move.
+    start = time.perf_counter()
+    candidates = placements(board, piece)
+    if not candidates:
+      return None
+    scores = self.evaluator.scores(board, piece, candidates)
+    evaluated = len(candidates)
+    if self.lookahead and next_piece is not None:
+      lines_weight = self.evaluator.weights[1]
+      for k, candidate in enumerate(candidates):
+        after = board.copy()
+        lines = place(after, piece.copy(), candidate)
+        following = next_piece.copy()
+        next_candidates = placements(after, following)
+        evaluated += len(next_candidates)
+        scores[k] = (lines_weight * lines +
+                     self.evaluator.scores(after, following,
+                                           next_candidates).max()
+                     if next_candidates else -np.inf)
+    self.stats['placements'] += evaluated
+    self.stats['seconds'] += time.perf_counter() - start
+    return candidates[int(np.argmax(scores))]
+
+
+def play_game(agent, seed=None, w=15, h=20, max_pieces=None, log=None):
+  # Plays until a new piece does not fit, as main.py would with w x h cells.
+  # Returns (pieces placed, lines cleared). The placements are appended to
+  # log if given; with the seed and board size they are a replay log.
+  rng = random.Random(seed)
+  spawn = (w // 2 + 2, 2)
+  board = Board(w, h)
+  piece = GeneratePiece(*spawn, rng=rng)
+  next_piece = GeneratePiece(*spawn, rng=rng)
+  pieces = lines = 0
+  while board.fits(piece) and (max_pieces is None or pieces < max_pieces):
+    placement = agent.act(board, piece, next_piece)
+    if placement is None:
+      break
+    lines += place(board, piece, placement)
+    pieces += 1
+    if log is not None:
+      log.append(placement)
+    piece, next_piece = next_piece, GeneratePiece(*spawn, rng=rng)
+  return pieces, lines
+
+
+def replay(seed, log, w=15, h=20):
+  # Plays the logged placements of play_game on the same pieces without the
+  # agent, so only the rules code is timed. Returns (pieces, lines).
+  rng = random.Random(seed)
+  spawn = (w // 2 + 2, 2)
+  board = Board(w, h)
+  lines = 0
+  for placement in log:
+    piece = GeneratePiece(*spawn, rng=rng)
+    lines += place(board, piece, placement)
+  return len(log), lines
+
+
+def main():
+  # python ai.py [games] [max_pieces]: headless games with and without
+  # lookahead; reports lines and placements evaluated per second, then
+  # replays the games and reports pieces per second without the agent.
+  num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+  max_pieces = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+  for lookahead in (False, True):
+    agent = TetrisAgent(lookahead=lookahead)
+    start = time.perf_counter()
+    total_pieces = 0
+    logs, results = [], []
+    for seed in range(num_games):
+      logs.append([])
+      results.append(play_game(agent, seed, max_pieces=max_pieces,
+                               log=logs[-1]))
+      total_pieces += results[-1][0]
+      print('lookahead %d, game %d: %d pieces, %d lines' % (
+        (lookahead, seed) + results[-1]))
+    seconds = time.perf_counter() - start
+    print('lookahead %d: %.0f placements/sec, %.0f pieces/sec' % (
+      lookahead, agent.stats['placements'] / agent.stats['seconds'],
+      total_pieces / seconds))
+    start = time.perf_counter()
+    for seed, log in enumerate(logs):
+      if replay(seed, log) != results[seed]:
+        raise AssertionError('game %d: replay differs' % seed)
+    print('lookahead %d replayed: %.0f pieces/sec' % (
+      lookahead, total_pieces / (time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+import sys
+import time
+
+import numpy as np
+
+from simulation import MASKS, ROTATIONS, Board, Piece
+from ai import DEFAULT_WEIGHTS
+
+
+# Boards are field rows as in Board.field(), hidden top rows included, with
+# bit x of a row set when column x is filled. A placement is a rotation of
+# the current piece (clockwise quarter turns from its MASKS orientation) and
+# the column of its leftmost cell; the piece drops straight down from the
+# row where main.py spawns it. A game is over when a placement does not fit
+# on the board below that row or the next piece does not fit at its spawn.
+
+
+def clear_lines(rows, full):
+  # Clears full rows as Board.burn does: the rows above drop down and empty
+  # rows come in at the top. rows is (..., R); returns (rows, lines).
+  is_full = rows == full
+  lines = is_full.sum(axis=-1)
+  if lines.any():
+    order = np.argsort(~is_full, axis=-1, kind='stable')
+    rows = np.take_along_axis(rows, order, axis=-1)
+    rows[np.arange(rows.shape[-1]) < lines[..., None]] = 0
+  return rows, lines
+
+
+def column_bits(rows, w):
+  # (..., R, w) array of the cells of each row.
+  return (rows[..., None] >> np.arange(w, dtype=rows.dtype)) & 1
+
+
+def features(rows, w):
+  # Aggregate height, holes and bumpiness of boards given as (..., R) rows,
+  # like ai.Evaluator after its lines are cleared.
+  bits = column_bits(rows, w)
+  num_rows = rows.shape[-1]
+  heights = np.where(bits.any(axis=-2), num_rows - bits.argmax(axis=-2), 0)
+  aggregate = heights.sum(axis=-1)
+  holes = aggregate - bits.sum(axis=(-2, -1))
+  bumpiness = np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+  return aggregate, holes, bumpiness
+
+
+class BatchTetris:
+  # num_games boards of w x h cells stepped together. Pieces come from a
+  # numpy generator seeded with seed. lines and pieces count per game, over
+  # flags finished games, which ignore further placements.
+  def __init__(self, num_games, w=15, h=20, seed=0):
+    self.num_games = num_games
+    self.w = w
+    self.h = h
+    self.pad = Board(1, 1).pad
+    self.num_rows = self.pad + h
+    self.full = (1 << w) - 1
+    self.rng = np.random.default_rng(seed)
+    self._tables()
+    self.reset()
+
+  def _tables(self):
+    # Per shape and rotation: the piece rows from its top occupied row
+    # (leftmost cell at bit 0), its width, the lowest occupied row of each
+    # of its columns (-1 for none) and its offset in the 5x5 grid. Plus the
+    # rows each shape covers when it spawns.
+    num_shapes = len(MASKS)
+    self.piece_rows = np.zeros((num_shapes, 4, 5), dtype=np.uint32)
+    self.widths = np.zeros((num_shapes, 4), dtype=np.int64)
+    self.bottoms = np.full((num_shapes, 4, 5), -1, dtype=np.int64)
+    self.offsets = np.zeros((num_shapes, 4, 2), dtype=np.int64)
+    self.spawn_rows = np.zeros((num_shapes, 5), dtype=np.uint32)
+    self.spawn_y = 2
+    spawn_x = self.w // 2 + 2 - self.pad
+    for shape, rotations in enumerate(ROTATIONS):
+      for r, rotation in enumerate(rotations):
+        left = min(x for x, y in rotation.cells)
+        top = min(y for x, y in rotation.cells)
+        for x, y in rotation.cells:
+          self.piece_rows[shape, r, y - top] |= 1 << (x - left)
+          self.bottoms[shape, r, x - left] = max(
+            self.bottoms[shape, r, x - left], y - top)
+        self.widths[shape, r] = max(x for x, y in rotation.cells) - left + 1
+        self.offsets[shape, r] = left, top
+      for x, y in rotations[0].cells:
+        self.spawn_rows[shape, y] |= 1 << (spawn_x + x)
+
+  def reset(self):
+    self.rows = np.zeros((self.num_games, self.num_rows), dtype=np.uint32)
+    self.shapes = self.rng.integers(len(MASKS), size=self.num_games)
+    self.next_shapes = self.rng.integers(len(MASKS), size=self.num_games)
+    self.lines = np.zeros(self.num_games, dtype=np.int64)
+    self.pieces = np.zeros(self.num_games, dtype=np.int64)
+    self.over = np.zeros(self.num_games, dtype=bool)
+
+  def tops(self, rows):
+    # First filled row of each column, num_rows if empty, padded with four
+    # empty columns on the right; rows is (..., R).
+    bits = column_bits(rows, self.w)
+    tops = np.where(bits.any(axis=-2), bits.argmax(axis=-2), self.num_rows)
+    padding = np.full(tops.shape[:-1] + (4,), self.num_rows)
+    return np.concatenate([tops, padding], axis=-1)
+
+  def drop(self, rows, shapes, rotations, columns):
+    # Boards after dropping the pieces, the row their top lands on and
+    # whether the placement is legal. Arrays broadcast against each other,
+    # rows has an extra trailing R axis.
+    tops = self.tops(rows)
+    bottoms = self.bottoms[shapes, rotations]
+    fits = ((columns >= 0) &
+            (columns + self.widths[shapes, rotations] <= self.w))
+    columns = np.clip(columns, 0, self.w - 1)
+    cols = columns[..., None] + np.arange(5)
+    landing = np.take_along_axis(
+      np.broadcast_to(tops, cols.shape[:-1] + tops.shape[-1:]), cols, axis=-1)
+    ys = np.where(bottoms >= 0, landing - bottoms - 1, self.num_rows).min(
+      axis=-1)
+    legal = fits & (ys >= self.spawn_y + self.offsets[shapes, rotations, 1])
+    ys = np.where(legal, ys, 0)
+    piece = np.where(legal[..., None], self.piece_rows[shapes, rotations], 0)
+    piece = piece << columns[..., None].astype(np.uint32)
+    padded = np.concatenate(
+      [np.broadcast_to(rows, piece.shape[:-1] + rows.shape[-1:]),
+       np.zeros(piece.shape[:-1] + (4,), dtype=rows.dtype)], axis=-1).copy()
+    index = ys[..., None] + np.arange(5)
+    np.put_along_axis(padded, index,
+                      np.take_along_axis(padded, index, axis=-1) | piece,
+                      axis=-1)
+    return padded[..., :self.num_rows], ys, legal
+
+  def step(self, rotations, columns):
+    # Places the current piece of every running game. Returns the lines
+    # cleared by this step and the over flags.
+    running = ~self.over
+    rows, ys, legal = self.drop(self.rows, self.shapes,
+                                np.asarray(rotations) % 4,
+                                np.asarray(columns))
+    rows, lines = clear_lines(rows, self.full)
+    placed = running & legal
+    self.rows[placed] = rows[placed]
+    lines = np.where(placed, lines, 0)
+    self.lines += lines
+    self.pieces += placed
+    self.shapes = np.where(running, self.next_shapes, self.shapes)
+    self.next_shapes = np.where(
+      running, self.rng.integers(len(MASKS), size=self.num_games),
+      self.next_shapes)
+    blocked = (self.rows[:, self.spawn_y:self.spawn_y + 5] &
+               self.spawn_rows[self.shapes]).any(axis=1)
+    self.over |= running & (~legal | blocked)
+    return lines, self.over
+
+  def greedy_actions(self, weights=DEFAULT_WEIGHTS):
+    # Best (rotation, column) of each game under the ai.Evaluator weights,
+    # scoring all 4 * w placements of every game in one pass.
+    num_actions = 4 * self.w
+    actions = np.arange(num_actions)
+    rotations = np.broadcast_to(actions // self.w, (self.num_games,
+                                                    num_actions))
+    columns = np.broadcast_to(actions % self.w, rotations.shape)
+    rows, _, legal = self.drop(self.rows[:, None], self.shapes[:, None],
+                               rotations, columns)
+    rows, lines = clear_lines(rows, self.full)
+    aggregate, holes, bumpiness = features(rows, self.w)
+    scores = (weights[0] * aggregate + weights[1] * lines +
+              weights[2] * holes + weights[3] * bumpiness)
+    best = np.where(legal, scores, -np.inf).argmax(axis=1)
+    return best // self.w, best % self.w
+
+
+def differential_check(num_steps=200, num_games=64, seed=0):
+  # Replays the placements of every game on a simulation.Board, dropping the
+  # same pieces at the same columns, and compares the fields after each step.
+  batch = BatchTetris(num_games, seed=seed)
+  boards = [Board(batch.w, batch.h) for _ in range(num_games)]
+  rng = np.random.default_rng(seed + 1)
+  for _ in range(num_steps):
+    if batch.over.all():
+      break
+    if rng.random() < 0.5:
+      rotations, columns = batch.greedy_actions()
+    else:
+      rotations = rng.integers(4, size=num_games)
+      columns = rng.integers(batch.w, size=num_games)
+    shapes, running = batch.shapes.copy(), ~batch.over
+    before = batch.rows.copy()
+    batch.step(rotations, columns)
+    for n in np.flatnonzero(running):
+      if (batch.rows[n] == before[n]).all() and batch.over[n]:
+        continue
+      board = boards[n]
+      left, top = batch.offsets[shapes[n], rotations[n] % 4]
+      piece = Piece(board.pad + columns[n] - left, batch.spawn_y, shapes[n],
+                    rotations[n] % 4)
+      while board.fits(piece, dy=1):
+        piece.shift(0, 1)
+      board.add(piece)
+      board.burn()
+      expected = (board.field().astype(np.uint32) <<
+                  np.arange(batch.w, dtype=np.uint32)).sum(axis=1)
+      if not (expected == batch.rows[n]).all():
+        raise AssertionError('game %d differs from Board' % n)
+  return int(batch.pieces.sum())
+
+
+def benchmark(num_games, max_pieces, seed=0):
+  # Greedy games to the end or max_pieces.
+  batch = BatchTetris(num_games, seed=seed)
+  start = time.perf_counter()
+  steps = 0
+  while not batch.over.all() and steps < max_pieces:
+    batch.step(*batch.greedy_actions())
+    steps += 1
+  seconds = time.perf_counter() - start
+  print('%d games, %d steps: %d pieces, %.1f lines per game, %d over, '
+        '%.0f pieces/sec, %.0f placements evaluated/sec' % (
+          num_games, steps, batch.pieces.sum(), batch.lines.mean(),
+          batch.over.sum(), batch.pieces.sum() / seconds,
+          4 * batch.w * num_games * steps / seconds))
+
+
+def main():
+  # python batch.py [num_games] [max_pieces]
+  num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+  max_pieces = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+  print('%d pieces match Board.' % differential_check())
+  benchmark(num_games, max_pieces)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,162 @@
+import collections
+import numpy as np
+import random
+
+MASKS = [
+  ['.....',
+   '.....',
+   '..#..',
+   '.###.',
+   '.....'],
+  ['.....',
+   '..#..',
+   '..#..',
+   '..#..',
+   '..#..'],
+  ['.....',
+   '..##.',
+   '..#..',
+   '..#..',
+   '.....'],
+  ['.....',
+   '.##..',
+   '..#..',
+   '..#..',
+   '.....'],
+  ['.....',
+   '.....',
+   '..##.',
+   '..##.',
+   '.....'],
+  ['.....',
+   '.....',
+   '..##.',
+   '.##..',
+   '.....'],
+  ['.....',
+   '.....',
+   '.##..',
+   '..##.',
+   '.....'],
+  ['.....',
+   '.....',
+   '..#..',
+   '.....',
+   '.....'],
+
+]
+
+
+# One rotation of a mask: bits has bit 5 * y + x set for each occupied cell
+# (x, y) of the 5x5 grid, cells lists those (x, y) offsets and array is the
+# grid as uint8 for tests against the board.
+Rotation = collections.namedtuple('Rotation', 'bits cells array')
+
+
+def _rotations(mask):
+  # The four clockwise rotations of a mask.
+  grid = np.array([[c == '#' for c in row] for row in mask], dtype=np.uint8)
+  rotations = []
+  for r in range(4):
+    array = np.ascontiguousarray(np.rot90(grid, -r))
+    array.flags.writeable = False
+    cells = tuple((x, y) for y in range(5) for x in range(5) if array[y, x])
+    bits = sum(1 << (5 * y + x) for x, y in cells)
+    rotations.append(Rotation(bits, cells, array))
+  return tuple(rotations)
+
+
+# ROTATIONS[shape][rotation] for shape indexing MASKS.
+ROTATIONS = tuple(_rotations(mask) for mask in MASKS)
+
+
+class Piece:
+  # shape indexes MASKS, rotation counts clockwise quarter turns and (x, y)
+  # is the top left corner of the 5x5 grid on the board. Moves change the
+  # piece in place.
+  __slots__ = ('shape', 'rotation', 'x', 'y')
+
+  def __init__(self, x, y, shape, rotation=0):
+    self.x = x
+    self.y = y
+    self.shape = shape
+    self.rotation = rotation
+
+  def copy(self):
+    return Piece(self.x, self.y, self.shape, self.rotation)
+
+  def rotate(self, times=1):
+    self.rotation = (self.rotation + times) % 4
+
+  def shift(self, dx, dy):
+    self.x += dx
+    self.y += dy
+
+  def mask(self, turns=0):
+    return ROTATIONS[self.shape][(self.rotation + turns) % 4]
+
+  def at(self, x, y):
+    return self.mask().bits >> (5 * y + x) & 1
+
+
+def GeneratePiece(x, y, rng=random):
+  return Piece(x, y, rng.randrange(len(MASKS)))
+
+
+class Board:
+  # Cells are a uint8 array v[y, x] padded by pad solid cells on the sides
+  # and the bottom; the pad rows on top are empty space where pieces enter.
+  # Only locked pieces are stored, the falling piece is kept apart and
+  # checked with fits.
+  def __init__(self, w, h):
+    self.w = w
+    self.h = h
+    self.pad = 5
+    self.v = np.ones((h + 2 * self.pad, w + 2 * self.pad), dtype=np.uint8)
+    self.field()[:] = 0
+
+  def copy(self):
+    other = Board.__new__(Board)
+    other.w, other.h, other.pad = self.w, self.h, self.pad
+    other.v = self.v.copy()
+    return other
+
+  def field(self):
+    # View of the cells pieces can occupy, hidden top rows included.
+    return self.v[:self.pad + self.h, self.pad:self.pad + self.w]
+
+  def at(self, x, y):
+    return self.v[y, x]
+
+  def set(self, x, y, value):
+    self.v[y, x] = value
+
+  def fits(self, piece, dx=0, dy=0, turns=0):
+    # Whether the piece moved by (dx, dy) and turned clockwise turns times
+    # would fit, without moving it.
+    x, y = piece.x + dx, piece.y + dy
+    window = self.v[y:y + 5, x:x + 5]
+    return (window.shape == (5, 5) and x >= 0 and y >= 0 and
+            not (window & piece.mask(turns).array).any())
+
+  def add(self, piece):
+    self.v[piece.y:piece.y + 5, piece.x:piece.x + 5] |= piece.mask().array
+
+  def burn(self):
+    # Clears all full rows at once and drops the rows above them. Returns the
+    # number of lines cleared.
+    field = self.field()
+    full = field.all(axis=1)
+    lines = int(full.sum())
+    if lines:
+      field[lines:] = field[~full]
+      field[:lines] = 0
+    return lines
+
+  def display(self, view, piece=None):
+    v = self.v.copy()
+    if piece is not None:
+      v[piece.y:piece.y + 5, piece.x:piece.x + 5] |= piece.mask().array
+    for x in range(self.w):
+      for y in range(self.h):
+        view.draw(x, y, v[self.pad + y, self.pad + x])